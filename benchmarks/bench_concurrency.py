@@ -0,0 +1,84 @@
+"""Read throughput of the versioned data store with and without concurrent writes.
+
+Reader threads repeatedly take the current snapshot and ask its user
+similarity recommender for recommendations; an optional writer thread adds
+ratings continuously, publishing a new version every batch. Nothing is
+written to disk. Run from the project root:
+
+    python benchmarks/bench_concurrency.py [readers] [seconds]
+"""
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_store import VersionedDataStore
+
+
+def reader(store, user_ids, stop, seed):
+    rng = random.Random(seed)
+    reads = 0
+    errors = 0
+    while not stop.is_set():
+        version = store.snapshot()
+        try:
+            version.user_similarity_recommender().recommend(rng.choice(user_ids), n=10)
+        except RuntimeError:
+            errors += 1
+        reads += 1
+    return reads, errors
+
+
+def writer(store, user_ids, movie_ids, stop):
+    rng = random.Random(0)
+    writes = 0
+    while not stop.is_set():
+        store.add_rating(rng.choice(user_ids), rng.choice(movie_ids), rng.randint(1, 10) / 2.0)
+        writes += 1
+        time.sleep(0.0005)
+    return writes
+
+
+def run(store, user_ids, movie_ids, n_readers, seconds, with_writer):
+    stop = threading.Event()
+    start_version = store.version
+    with ThreadPoolExecutor(max_workers=n_readers + 1) as pool:
+        readers = [pool.submit(reader, store, user_ids, stop, seed) for seed in range(n_readers)]
+        write_future = pool.submit(writer, store, user_ids, movie_ids, stop) if with_writer else None
+        time.sleep(seconds)
+        stop.set()
+        results = [future.result() for future in readers]
+        writes = write_future.result() if write_future else 0
+
+    reads = sum(r for r, _ in results)
+    errors = sum(e for _, e in results)
+    label = 'with writer' if with_writer else 'read only'
+    print(f"{label:<12}{reads / seconds:>12.1f} reads/s{writes:>10} writes"
+          f"{store.version - start_version:>10} versions{errors:>8} errors")
+
+
+def main():
+    n_readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    os.chdir(ROOT)
+
+    store = VersionedDataStore.from_files('dataset/movies.csv', 'dataset/ratings.csv', batch_size=50)
+    version = store.snapshot()
+    user_ids = list(version.user_ratings)
+    movie_ids = list(version.movies)
+    # Build the recommender up front so both runs start from a warm version
+    version.user_similarity_recommender()
+
+    print(f"{n_readers} reader threads, {seconds:.0f} s per run\n")
+    run(store, user_ids, movie_ids, n_readers, seconds, with_writer=False)
+    run(store, user_ids, movie_ids, n_readers, seconds, with_writer=True)
+
+
+if __name__ == '__main__':
+    main()
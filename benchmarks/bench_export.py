@@ -0,0 +1,64 @@
+"""Throughput of the bulk export for the full user set, per recommender and format.
+
+Builds each recommender once, then times exporting top-n recommendations for
+every user to a temporary directory (nothing is written under the project).
+Peak RSS is reported after each export to show that memory stays flat as
+row groups are streamed out. Run from the project root:
+
+    python benchmarks/bench_export.py [n] [recommender ...]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_store import VersionedDataStore
+from evaluation import build_recommender, resolve_recommender
+from export import FORMATS, default_format, export_movie_stats, export_recommendations
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    names = sys.argv[2:] or ['genre-weighted', 'tag']
+    os.chdir(ROOT)
+
+    data = VersionedDataStore.from_files('dataset/movies.csv', 'dataset/ratings.csv').snapshot()
+    user_ids = list(data.user_ratings)
+    formats = [f for f in FORMATS if f != 'parquet' or default_format() == 'parquet']
+    print(f"{len(user_ids)} users, top-{n}, formats: {', '.join(formats)}\n")
+    print(f"{'recommender':<18}{'format':<9}{'rows':>9}{'users/s':>11}{'rows/s':>12}{'MB':>8}{'max RSS MB':>12}")
+
+    with tempfile.TemporaryDirectory() as out:
+        for file_format in formats:
+            path = os.path.join(out, f'movie_stats.{file_format}')
+            start = time.perf_counter()
+            rows = export_movie_stats(data.movies, path, file_format=file_format)
+            elapsed = time.perf_counter() - start
+            print(f"{'movie stats':<18}{file_format:<9}{rows:>9}{'':>11}{rows / elapsed:>12.0f}"
+                  f"{os.path.getsize(path) / 1e6:>8.2f}{max_rss_mb():>12.1f}")
+
+        for name in names:
+            cls, init_kwargs, recommend_kwargs = resolve_recommender(name)
+            recommender = build_recommender(cls, data, init_kwargs)
+            for file_format in formats:
+                path = os.path.join(out, f'{name}.{file_format}')
+                start = time.perf_counter()
+                rows = export_recommendations(
+                    recommender, user_ids, path, name, n, file_format=file_format, **recommend_kwargs
+                )
+                elapsed = time.perf_counter() - start
+                print(f"{name:<18}{file_format:<9}{rows:>9}{len(user_ids) / elapsed:>11.1f}{rows / elapsed:>12.0f}"
+                      f"{os.path.getsize(path) / 1e6:>8.2f}{max_rss_mb():>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
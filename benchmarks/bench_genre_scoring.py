@@ -0,0 +1,43 @@
+"""Time genre recommendations for every user under each scoring mode.
+
+Run from the project root:
+
+    python benchmarks/bench_genre_scoring.py
+"""
+import os
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import load_data
+from genre_recommender import GenreRecommender
+
+
+def timed(label, func, n_users):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed:>10.3f} s{n_users / elapsed:>12.0f} users/s")
+
+
+def main():
+    os.chdir(ROOT)
+    movies, user_ratings, _, genre_movies = load_data(
+        'dataset/movies.csv', 'dataset/ratings.csv', lazy=True, max_cached_users=1024
+    )
+    user_ids = list(user_ratings.keys())
+
+    rating_recommender = GenreRecommender(movies, user_ratings, genre_movies)
+    weighted_recommender = GenreRecommender(movies, user_ratings, genre_movies, scoring='weighted')
+
+    print(f"Recommending for {len(user_ids)} users\n")
+    timed("rating, per user", lambda: [rating_recommender.recommend(u) for u in user_ids], len(user_ids))
+    timed("weighted, per user", lambda: [weighted_recommender.recommend(u) for u in user_ids], len(user_ids))
+    timed("weighted, batch", lambda: weighted_recommender.recommend_batch(user_ids), len(user_ids))
+
+
+if __name__ == '__main__':
+    main()
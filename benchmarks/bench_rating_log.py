@@ -0,0 +1,63 @@
+"""Measure rating log append throughput and startup replay time.
+
+Writes a synthetic log to a temporary directory (the real dataset/ratings.log
+is never touched) and times loading the dataset with it replayed. Run from
+the project root:
+
+    python benchmarks/bench_rating_log.py [n_records]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import load_data
+from rating_log import MAGIC, RECORD_DTYPE, RatingLog
+
+
+def write_synthetic_log(path, movie_ids, n_records, seed=0):
+    rng = np.random.default_rng(seed)
+    records = np.zeros(n_records, dtype=RECORD_DTYPE)
+    records['user_id'] = rng.integers(1, 2000, n_records)
+    records['movie_id'] = rng.choice(movie_ids, n_records)
+    records['rating'] = rng.integers(1, 11, n_records) / 2.0
+    records['timestamp'] = int(time.time())
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        records.tofile(f)
+
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    os.chdir(ROOT)
+    movies, _, _, _ = load_data('dataset/movies.csv', 'dataset/ratings.csv', lazy=True)
+    movie_ids = np.array(list(movies.keys()))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        append_path = os.path.join(temp_dir, 'append.log')
+        n_appends = 100_000
+        start = time.perf_counter()
+        with RatingLog(append_path) as log:
+            for i in range(n_appends):
+                log.append(1, int(movie_ids[i % len(movie_ids)]), 4.0)
+        elapsed = time.perf_counter() - start
+        print(f"append: {n_appends} records in {elapsed:.3f} s ({n_appends / elapsed:,.0f} records/s)")
+
+        log_path = os.path.join(temp_dir, 'replay.log')
+        write_synthetic_log(log_path, movie_ids, n_records)
+        for lazy in (True, False):
+            start = time.perf_counter()
+            load_data('dataset/movies.csv', 'dataset/ratings.csv', lazy=lazy, rating_log_path=log_path)
+            elapsed = time.perf_counter() - start
+            name = 'lazy' if lazy else 'eager'
+            print(f"load + replay {n_records:,} records ({name}): {elapsed:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Neighbour search latency as the user base is split over more shards.
+
+Times ``find_similar_users`` in the single-process recommender and through a
+``ShardedNeighborIndex`` with 1, 2, 4, ... local shard worker processes, and
+checks that every sharded answer matches the single-process one. The dataset
+can be replicated ``copies`` times (as new users with the same ratings) to
+approximate a larger tenant. Run from the project root:
+
+    python benchmarks/bench_sharding.py [max_shards] [copies] [queries]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import load_data
+from genre_preferences import rating_arrays
+from shard_search import ShardPartition, ShardedNeighborIndex
+
+
+def replicate(user_ids, movie_ids, ratings, copies):
+    """Repeat the ratings as ``copies`` disjoint sets of users."""
+    stride = int(user_ids.max()) + 1
+    offsets = np.repeat(np.arange(copies, dtype=np.int64) * stride, len(user_ids))
+    return np.tile(user_ids, copies) + offsets, np.tile(movie_ids, copies), np.tile(ratings, copies)
+
+
+def time_queries(search, queries):
+    latencies = []
+    results = []
+    for user_id, movie_ids in queries:
+        start = time.perf_counter()
+        results.append(search(user_id, movie_ids))
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000, results
+
+
+def report(label, latencies, setup=None):
+    setup_text = f"{setup:>10.2f} s" if setup is not None else ' ' * 12
+    print(f"{label:<22}{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+          f"{len(latencies) / (latencies.sum() / 1000):>11.1f}{setup_text}")
+
+
+def main():
+    max_shards = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    os.chdir(ROOT)
+
+    _, user_ratings, _, _ = load_data('dataset/movies.csv', 'dataset/ratings.csv', lazy=True)
+    base_users, base_movies, base_ratings = rating_arrays(user_ratings)
+    user_ids, movie_ids, ratings = replicate(
+        np.asarray(base_users), np.asarray(base_movies), np.asarray(base_ratings), copies
+    )
+    print(f"{len(np.unique(user_ids))} users, {len(user_ids)} ratings, {n_queries} queries of top-20\n")
+
+    rng = np.random.default_rng(0)
+    query_users = rng.choice(np.unique(base_users), n_queries).tolist()
+    queries = [(user_id, list(user_ratings[user_id].keys())) for user_id in query_users]
+
+    print(f"{'mode':<22}{'p50 ms':>9}{'p95 ms':>9}{'queries/s':>11}{'setup':>12}")
+    start = time.perf_counter()
+    partition = ShardPartition(user_ids, movie_ids, ratings)
+    setup = time.perf_counter() - start
+    latencies, expected = time_queries(
+        lambda user_id, movies: partition.top_k(movies, 20, exclude_user_id=user_id), queries
+    )
+    report('single process', latencies, setup)
+
+    n_shards = 1
+    while n_shards <= max_shards:
+        start = time.perf_counter()
+        with ShardedNeighborIndex(user_ids, movie_ids, ratings, n_shards) as index:
+            setup = time.perf_counter() - start
+            latencies, results = time_queries(
+                lambda user_id, movies: index.find_similar_users(movies, 20, exclude_user_id=user_id), queries
+            )
+        mismatches = sum(result != reference for result, reference in zip(results, expected))
+        report(f"{n_shards} shard(s)", latencies, setup)
+        if mismatches:
+            print(f"  {mismatches} results differ from the single-process search")
+        n_shards *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Measure import time, data loading, first recommendation and peak memory for eager vs lazy mode.
+
+Each mode runs in a fresh interpreter so imports and caches do not leak
+between measurements. Import cost is taken from ``python -X importtime``.
+Run from the project root:
+
+    python benchmarks/bench_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy', 'scipy', 'pyarrow')
+
+CHILD = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from data_loader import load_data
+movies, user_ratings, user_movie_mapping, genre_movies = load_data(
+    'dataset/movies.csv', 'dataset/ratings.csv', lazy={lazy}
+)
+loaded = time.perf_counter()
+# Touch a single user, as the interactive flow does before the first menu
+user_id = min(user_ratings.keys())
+user_ratings[user_id]
+
+from user_similarity_recommender import UserSimilarityRecommender
+recommender = UserSimilarityRecommender(movies, user_ratings, user_movie_mapping)
+recommend_start = time.perf_counter()
+recommender.recommend(user_id)
+recommended = time.perf_counter()
+recommender.recommend(user_id, recursive_depth=2)
+recursive = time.perf_counter()
+print(json.dumps({{
+    'load_seconds': loaded - start,
+    'recommend_seconds': recommended - recommend_start,
+    'recursive_seconds': recursive - recommended,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'pandas_imported': 'pandas' in sys.modules,
+}}))
+'''
+
+
+def run_mode(lazy, importtime=False):
+    code = CHILD.format(root=ROOT, lazy=lazy)
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', code]
+    completed = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def summarize_importtime(stderr):
+    """Return (total seconds, {heavy module: cumulative seconds}) from -X importtime output.
+
+    Only top-level imports (no extra indentation in the module column) are
+    summed, since their cumulative time already includes nested imports.
+    Heavy modules are reported wherever they first appear in the tree.
+    """
+    total_us = 0
+    heavy = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        module = name.strip()
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+        if module in HEAVY_MODULES and module not in heavy:
+            heavy[module] = int(cumulative) / 1e6
+    return total_us / 1e6, heavy
+
+
+def import_main_seconds():
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    total, _ = summarize_importtime(completed.stderr)
+    return total
+
+
+def main():
+    # Warm the on-disk snapshot so the lazy run measures a normal startup
+    run_mode(lazy=True)
+
+    print(f"import main: {import_main_seconds():.3f} s (before any data is loaded)\n")
+
+    # The first user-similarity recommendation after loading, direct and with depth 2
+    print(f"{'mode':<8}{'load (s)':>12}{'first rec (s)':>15}{'depth 2 (s)':>13}{'max RSS (MB)':>16}{'pandas':>10}")
+    for lazy in (False, True):
+        result, _ = run_mode(lazy)
+        name = 'lazy' if lazy else 'eager'
+        pandas_imported = 'yes' if result['pandas_imported'] else 'no'
+        print(f"{name:<8}{result['load_seconds']:>12.3f}{result['recommend_seconds']:>15.3f}"
+              f"{result['recursive_seconds']:>13.3f}{result['max_rss_mb']:>16.1f}{pandas_imported:>10}")
+
+    print("\nImport time during startup (-X importtime):")
+    for lazy in (False, True):
+        _, stderr = run_mode(lazy, importtime=True)
+        total, heavy = summarize_importtime(stderr)
+        name = 'lazy' if lazy else 'eager'
+        details = ', '.join(f"{module} {seconds:.3f} s" for module, seconds in sorted(heavy.items()))
+        print(f"  {name:<6} total {total:.3f} s" + (f" ({details})" if details else ''))
+
+
+if __name__ == '__main__':
+    main()
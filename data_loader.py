@@ -1,21 +1,23 @@
-import pandas as pd
 from movie import Movie
 
 
 def load_movies(movies_path):
+    import pandas as pd
+
     try:
         movies_df = pd.read_csv(movies_path)
         movies = {}
         
-        for _, row in movies_df.iterrows():
+        columns = (movies_df['movieId'], movies_df['title'], movies_df['genres'])
+        for raw_movie_id, title, genres in zip(*columns):
             try:
-                movie_id = int(row['movieId'])
+                movie_id = int(raw_movie_id)
                 movies[movie_id] = Movie(
                     movie_id=movie_id,
-                    title=row['title'],
-                    genres=row['genres']
+                    title=title,
+                    genres=genres
                 )
-            except (ValueError, KeyError):
+            except ValueError:
                 continue
         
         if not movies:
@@ -24,6 +26,8 @@ def load_movies(movies_path):
         return movies
     except FileNotFoundError:
         raise
+    except KeyError as e:
+        raise ValueError(f"Movies CSV file is missing column {e}")
     except pd.errors.EmptyDataError:
         raise ValueError("The movies CSV file is empty")
     except pd.errors.ParserError as e:
@@ -31,6 +35,8 @@ def load_movies(movies_path):
 
 
 def load_ratings_and_compute_averages(ratings_path, movies):
+    import pandas as pd
+
     try:
         ratings_df = pd.read_csv(ratings_path)
         user_ratings = {}
@@ -80,10 +86,75 @@ def create_genre_movies_mapping(movies):
     return genre_movies
 
 
-def load_data(movies_path, ratings_path):
-    movies = load_movies(movies_path)
-    user_ratings = load_ratings_and_compute_averages(ratings_path, movies)
-    user_movie_mapping = create_user_movie_mapping(user_ratings)
+def load_data(movies_path, ratings_path, lazy=False, cache_dir=None, max_cached_users=256,
+              rating_log_path=None):
+    """Load movies, ratings and the derived mappings.
+
+    With ``lazy=True`` ratings come from an on-disk snapshot sorted by user
+    (built from the CSV files on first use) and user profiles are materialized
+    only when accessed; movies and their averages are read from the snapshot,
+    so a warm start does not import pandas at all.
+
+    If ``rating_log_path`` names an existing rating log, its updates are
+    replayed on top of the loaded ratings.
+    """
+    records = None
+    if rating_log_path is not None:
+        from rating_log import read_rating_log
+
+        records = read_rating_log(rating_log_path)
+
+    if lazy:
+        # The snapshot path needs only numpy once the cache is warm, so neither
+        # it nor pandas is imported until this branch runs.
+        from snapshot import LazyUserMovies, LazyUserRatings, load_or_build_snapshot
+
+        snapshot = load_or_build_snapshot(movies_path, ratings_path, load_movies, cache_dir)
+        if records is not None and len(records):
+            snapshot = snapshot.with_updates(records)
+        movies = snapshot.create_movies()
+        user_ratings = LazyUserRatings(snapshot, max_cached=max_cached_users)
+        user_movie_mapping = LazyUserMovies(user_ratings)
+    else:
+        movies = load_movies(movies_path)
+        user_ratings = load_ratings_and_compute_averages(ratings_path, movies)
+        user_movie_mapping = create_user_movie_mapping(user_ratings)
+        if records is not None and len(records):
+            from rating_log import replay_into
+
+            replay_into(user_ratings, user_movie_mapping, movies, records)
     genre_movies_mapping = create_genre_movies_mapping(movies)
     
-    return movies, user_ratings, user_movie_mapping, genre_movies_mapping
\ No newline at end of file
+    return movies, user_ratings, user_movie_mapping, genre_movies_mapping
+
+
+def load_tag_index(movies_path, ratings_path, lazy=False, cache_dir=None, movies=None):
+    """Build the tag and external-id index for the catalogue.
+
+    With ``lazy=True`` the index is read from the snapshot, where the tag
+    vectors and id arrays are stored alongside the ratings; otherwise
+    ``tags.csv`` and ``links.csv`` next to the movies file are parsed directly.
+    """
+    from tag_index import TagIndex
+
+    if lazy:
+        from snapshot import load_or_build_snapshot
+
+        snapshot = load_or_build_snapshot(movies_path, ratings_path, load_movies, cache_dir)
+        return TagIndex.from_snapshot(snapshot)
+
+    import os
+
+    import numpy as np
+
+    from tag_index import build_link_arrays, build_tag_arrays
+
+    if movies is None:
+        movies = load_movies(movies_path)
+    catalogue_ids = np.array(list(movies.keys()), dtype=np.int64)
+    dataset_dir = os.path.dirname(os.path.abspath(movies_path))
+    tags_path = os.path.join(dataset_dir, 'tags.csv')
+    links_path = os.path.join(dataset_dir, 'links.csv')
+    tag_arrays = build_tag_arrays(catalogue_ids, tags_path if os.path.exists(tags_path) else None)
+    link_arrays = build_link_arrays(catalogue_ids, links_path if os.path.exists(links_path) else None)
+    return TagIndex(catalogue_ids, **tag_arrays, **link_arrays)
@@ -0,0 +1,189 @@
+"""Versioned, copy-on-write data store for serving recommendations from many threads.
+
+Readers call ``store.snapshot()`` and get an immutable ``DataVersion``: its
+arrays are read-only and never change, so recommenders built on it can be used
+without locks while writes continue. Writers queue ratings with
+``store.add_rating``; ``publish`` folds the queued batch into a new snapshot
+and swaps it in with a single reference assignment, so a reader sees either
+the old version or the new one, never a mix.
+"""
+import threading
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from data_loader import create_genre_movies_mapping, load_movies
+from rating_log import RECORD_DTYPE, read_rating_log
+from snapshot import SNAPSHOT_ARRAYS, load_or_build_snapshot
+from tag_index import TagIndex
+
+
+class FrozenUserRatings(Mapping):
+    """Read-only user_id -> {movie_id: rating} view of a snapshot.
+
+    Profiles are materialized on first access and cached for the life of the
+    version; they are handed out as read-only mapping proxies.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._cache = {}
+
+    def __getitem__(self, user_id):
+        profile = self._cache.get(user_id)
+        if profile is not None:
+            return profile
+
+        user_slice = self.snapshot.user_slice(user_id)
+        if user_slice is None:
+            raise KeyError(user_id)
+        movie_ids, ratings = user_slice
+        profile = MappingProxyType(dict(zip(movie_ids.tolist(), ratings.tolist())))
+        # setdefault is atomic, so racing readers all end up sharing one copy
+        return self._cache.setdefault(user_id, profile)
+
+    def __contains__(self, user_id):
+        return self.snapshot.user_position(user_id) is not None
+
+    def __iter__(self):
+        return iter(self.snapshot.user_ids.tolist())
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def to_arrays(self):
+        snapshot = self.snapshot
+        return np.repeat(snapshot.user_ids, np.diff(snapshot.offsets)), snapshot.movie_ids, snapshot.ratings
+
+
+class FrozenUserMovies(Mapping):
+    """Read-only user_id -> frozenset of rated movie ids."""
+
+    def __init__(self, user_ratings):
+        self.user_ratings = user_ratings
+        self._cache = {}
+
+    def __getitem__(self, user_id):
+        movie_ids = self._cache.get(user_id)
+        if movie_ids is None:
+            movie_ids = self._cache.setdefault(user_id, frozenset(self.user_ratings[user_id].keys()))
+        return movie_ids
+
+    def __contains__(self, user_id):
+        return user_id in self.user_ratings
+
+    def __iter__(self):
+        return iter(self.user_ratings)
+
+    def __len__(self):
+        return len(self.user_ratings)
+
+
+class DataVersion:
+    """One immutable version of the catalogue and ratings."""
+
+    def __init__(self, number, snapshot):
+        for name in SNAPSHOT_ARRAYS:
+            array = getattr(snapshot, name)
+            if array.flags.writeable:
+                array.flags.writeable = False
+
+        self.number = number
+        self.snapshot = snapshot
+        self.movies = snapshot.create_movies()
+        self.user_ratings = FrozenUserRatings(snapshot)
+        self.user_movie_mapping = FrozenUserMovies(self.user_ratings)
+        self.genre_movies = create_genre_movies_mapping(self.movies)
+        self.tag_index = TagIndex.from_snapshot(snapshot)
+        self._recommenders = {}
+        self._recommenders_lock = threading.Lock()
+
+    def _recommender(self, key, factory):
+        recommender = self._recommenders.get(key)
+        if recommender is None:
+            with self._recommenders_lock:
+                recommender = self._recommenders.get(key)
+                if recommender is None:
+                    recommender = factory()
+                    self._recommenders[key] = recommender
+        return recommender
+
+    def user_similarity_recommender(self):
+        from user_similarity_recommender import UserSimilarityRecommender
+
+        return self._recommender('user_similarity', lambda: UserSimilarityRecommender(
+            self.movies, self.user_ratings, self.user_movie_mapping
+        ))
+
+    def genre_recommender(self, scoring='rating'):
+        from genre_recommender import GenreRecommender
+
+        return self._recommender(('genre', scoring), lambda: GenreRecommender(
+            self.movies, self.user_ratings, self.genre_movies, scoring=scoring
+        ))
+
+    def tag_recommender(self):
+        from tag_recommender import TagRecommender
+
+        return self._recommender('tag', lambda: TagRecommender(
+            self.movies, self.user_ratings, self.tag_index
+        ))
+
+
+class VersionedDataStore:
+    """Publishes batches of rating writes as new immutable versions.
+
+    Ratings are queued until ``batch_size`` are pending (or ``publish`` is
+    called). If a ``rating_log`` is given, every rating is appended to it as
+    soon as it is queued, so durability does not wait for publication.
+    """
+
+    def __init__(self, snapshot, batch_size=256, rating_log=None):
+        self.batch_size = batch_size
+        self.rating_log = rating_log
+        self._current = DataVersion(0, snapshot)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+
+    @classmethod
+    def from_files(cls, movies_path, ratings_path, rating_log_path=None, cache_dir=None, **kwargs):
+        snapshot = load_or_build_snapshot(movies_path, ratings_path, load_movies, cache_dir)
+        if rating_log_path is not None:
+            records = read_rating_log(rating_log_path)
+            if len(records):
+                snapshot = snapshot.with_updates(records)
+        return cls(snapshot, **kwargs)
+
+    def snapshot(self):
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.number
+
+    def add_rating(self, user_id, movie_id, rating, timestamp=None):
+        if timestamp is None:
+            timestamp = int(time.time())
+        with self._pending_lock:
+            if self.rating_log is not None:
+                self.rating_log.append(user_id, movie_id, rating, timestamp)
+            self._pending.append((user_id, movie_id, rating, timestamp))
+            should_publish = len(self._pending) >= self.batch_size
+        if should_publish:
+            self.publish()
+
+    def publish(self):
+        """Apply every pending rating in a new version and make it current."""
+        with self._publish_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return self._current
+
+            records = np.array(pending, dtype=RECORD_DTYPE)
+            current = self._current
+            self._current = DataVersion(current.number + 1, current.snapshot.with_updates(records))
+            return self._current
@@ -0,0 +1,239 @@
+"""Offline evaluation of recommenders on a holdout split of the ratings.
+
+Each user's ratings are split into train and test, either by time (the latest
+ratings are held out) or at random. A recommender is built on the training
+data in every worker of a process pool and asked for top-k recommendations
+for all test users; the results are scored against the held-out ratings at or
+above the relevance threshold.
+
+    python evaluation.py --recommender genre --recommender user-similarity --k 10
+"""
+import argparse
+import importlib
+import inspect
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from recommender import Recommender
+
+
+# name -> (module:Class, constructor kwargs, recommend kwargs)
+RECOMMENDERS = {
+    'genre': ('genre_recommender:GenreRecommender', {}, {}),
+    'genre-weighted': ('genre_recommender:GenreRecommender', {'scoring': 'weighted'}, {}),
+    'user-similarity': ('user_similarity_recommender:UserSimilarityRecommender', {}, {}),
+    'user-similarity-weighted': ('user_similarity_recommender:UserSimilarityRecommender', {}, {'weighted': True}),
+    'tag': ('tag_recommender:TagRecommender', {}, {}),
+}
+
+# Set in each worker process by _init_worker
+_worker_state = {}
+
+
+def holdout_split(ratings_path, test_fraction=0.2, method='time', seed=0):
+    """Split ratings per user into train and test DataFrames.
+
+    ``method='time'`` holds out each user's most recent ratings, ``'random'``
+    a random subset. Every user keeps at least one training rating.
+    """
+    import pandas as pd
+
+    ratings_df = pd.read_csv(ratings_path)
+    if method == 'time':
+        order_key = ratings_df['timestamp']
+    elif method == 'random':
+        order_key = pd.Series(np.random.default_rng(seed).random(len(ratings_df)), index=ratings_df.index)
+    else:
+        raise ValueError(f"Unknown split method '{method}', expected 'time' or 'random'")
+
+    position = order_key.groupby(ratings_df['userId']).rank(method='first', ascending=False)
+    user_counts = ratings_df.groupby('userId')['movieId'].transform('size')
+    n_test = np.minimum(np.floor(user_counts * test_fraction), user_counts - 1)
+    is_test = position <= n_test
+
+    return ratings_df[~is_test], ratings_df[is_test]
+
+
+def resolve_recommender(name):
+    """Return (class, constructor kwargs, recommend kwargs) for a name or 'module:Class'."""
+    path, init_kwargs, recommend_kwargs = RECOMMENDERS.get(name, (name, {}, {}))
+    module_name, _, class_name = path.partition(':')
+    if not class_name:
+        raise ValueError(f"Unknown recommender '{name}', expected one of {sorted(RECOMMENDERS)} or module:Class")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if not (inspect.isclass(cls) and issubclass(cls, Recommender)) or inspect.isabstract(cls):
+        raise ValueError(f"'{name}' is not a concrete Recommender subclass")
+    return cls, init_kwargs, recommend_kwargs
+
+
+def build_recommender(cls, data, init_kwargs):
+    """Instantiate a Recommender subclass, passing the data its constructor asks for by name."""
+    parameters = inspect.signature(cls.__init__).parameters
+    available = {
+        'movies': data.movies,
+        'user_ratings': data.user_ratings,
+        'user_movie_mapping': data.user_movie_mapping,
+        'genre_movies': data.genre_movies,
+        'tag_index': data.tag_index,
+    }
+    kwargs = {name: value for name, value in available.items() if name in parameters}
+    kwargs.update(init_kwargs)
+    return cls(**kwargs)
+
+
+# Longest a worker waits at the start barrier for the others to initialize
+READY_TIMEOUT = 600
+
+
+def _init_worker(movies_path, ratings_path, train_arrays, recommender_name, ready):
+    from data_loader import load_movies
+    from data_store import DataVersion
+    from snapshot import load_or_build_snapshot
+
+    try:
+        base = load_or_build_snapshot(movies_path, ratings_path, load_movies)
+        data = DataVersion(0, base.with_ratings(*train_arrays))
+        cls, init_kwargs, recommend_kwargs = resolve_recommender(recommender_name)
+        _worker_state['recommender'] = build_recommender(cls, data, init_kwargs)
+        _worker_state['recommend_kwargs'] = recommend_kwargs
+    except BaseException:
+        # Release the workers already waiting instead of leaving them blocked
+        ready.abort()
+        raise
+    # No worker takes a task until every worker has built its recommender
+    ready.wait(READY_TIMEOUT)
+
+
+def _worker_ready(_):
+    return os.getpid()
+
+
+def _evaluate_users(tasks, k):
+    recommender = _worker_state['recommender']
+    recommend_kwargs = _worker_state['recommend_kwargs']
+    results = []
+    for user_id, relevant in tasks:
+        start = time.perf_counter()
+        recommendations = recommender.recommend(user_id, n=k, **recommend_kwargs)
+        latency = time.perf_counter() - start
+        results.append((user_id, [movie.movie_id for movie in recommendations], relevant, latency))
+    return results
+
+
+def ranking_metrics(recommended, relevant, k):
+    """Return (precision@k, recall@k, NDCG@k) for one user with binary relevance."""
+    relevant = set(relevant)
+    gains = [1.0 if movie_id in relevant else 0.0 for movie_id in recommended[:k]]
+    hits = sum(gains)
+    dcg = sum(gain / math.log2(rank + 2) for rank, gain in enumerate(gains))
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return hits / k, hits / len(relevant), dcg / ideal if ideal else 0.0
+
+
+def evaluate(recommender_name, movies_path, ratings_path, k=10, test_fraction=0.2, method='time',
+             relevance_threshold=3.5, workers=None, chunk_size=16, max_users=None, seed=0):
+    """Evaluate one recommender and return a dict of quality and speed metrics."""
+    # Fail here rather than inside the worker initializer, which would only
+    # surface as a broken process pool
+    resolve_recommender(recommender_name)
+
+    from data_loader import load_movies
+    from snapshot import load_or_build_snapshot
+
+    catalogue_size = len(load_or_build_snapshot(movies_path, ratings_path, load_movies).catalogue_ids)
+    train_df, test_df = holdout_split(ratings_path, test_fraction, method, seed)
+    relevant_df = test_df[test_df['rating'] >= relevance_threshold]
+    relevant_by_user = relevant_df.groupby('userId')['movieId'].apply(list)
+    tasks = [(int(user_id), [int(m) for m in movie_ids]) for user_id, movie_ids in relevant_by_user.items()]
+    if max_users is not None:
+        tasks = tasks[:max_users]
+
+    train_arrays = (
+        train_df['userId'].to_numpy(dtype=np.int64),
+        train_df['movieId'].to_numpy(dtype=np.int64),
+        train_df['rating'].to_numpy(dtype=np.float64),
+    )
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(movies_path, ratings_path, train_arrays, recommender_name, manager.Barrier(workers)),
+    ) as pool:
+        # One task per worker makes the pool start all of them; none of these
+        # can finish before every initializer has passed the barrier.
+        list(pool.map(_worker_ready, range(workers)))
+        ready = time.perf_counter()
+        results = [result for chunk in pool.map(_evaluate_users, chunks, [k] * len(chunks)) for result in chunk]
+        elapsed = time.perf_counter() - ready
+    setup = ready - start
+
+    metrics = np.array([ranking_metrics(recs, relevant, k) for _, recs, relevant, _ in results]).reshape(-1, 3)
+    precision, recall, ndcg = metrics.mean(axis=0) if results else (0.0, 0.0, 0.0)
+    recommended_items = {movie_id for _, recs, _, _ in results for movie_id in recs}
+    latencies = np.array([latency for _, _, _, latency in results]) * 1000
+
+    return {
+        'recommender': recommender_name,
+        'users': len(results),
+        f'precision@{k}': float(precision),
+        f'recall@{k}': float(recall),
+        f'ndcg@{k}': float(ndcg),
+        'coverage': len(recommended_items) / catalogue_size,
+        'latency_p50_ms': float(np.percentile(latencies, 50)) if results else 0.0,
+        'latency_p95_ms': float(np.percentile(latencies, 95)) if results else 0.0,
+        'latency_p99_ms': float(np.percentile(latencies, 99)) if results else 0.0,
+        'throughput_users_per_s': len(results) / elapsed if elapsed else 0.0,
+        'setup_s': setup,
+    }
+
+
+def print_report(reports, k):
+    columns = [
+        ('recommender', '{:<26}'), ('users', '{:>6}'),
+        (f'precision@{k}', '{:>13.4f}'), (f'recall@{k}', '{:>10.4f}'), (f'ndcg@{k}', '{:>9.4f}'),
+        ('coverage', '{:>9.4f}'), ('latency_p50_ms', '{:>9.1f}'), ('latency_p95_ms', '{:>9.1f}'),
+        ('latency_p99_ms', '{:>9.1f}'), ('throughput_users_per_s', '{:>11.1f}'),
+    ]
+    headers = ['recommender', 'users', f'P@{k}', f'R@{k}', f'NDCG@{k}', 'coverage',
+               'p50 ms', 'p95 ms', 'p99 ms', 'users/s']
+    widths = [26, 6, 13, 10, 9, 9, 9, 9, 9, 11]
+    print(''.join(h.ljust(w) if i == 0 else h.rjust(w) for i, (h, w) in enumerate(zip(headers, widths))))
+    for report in reports:
+        print(''.join(fmt.format(report[key]) for key, fmt in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline evaluation of movie recommenders.")
+    parser.add_argument('--recommender', action='append',
+                        help=f"name ({', '.join(sorted(RECOMMENDERS))}) or module:Class; repeatable")
+    parser.add_argument('--movies', default=os.path.join('dataset', 'movies.csv'))
+    parser.add_argument('--ratings', default=os.path.join('dataset', 'ratings.csv'))
+    parser.add_argument('--split', choices=['time', 'random'], default='time')
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--relevance-threshold', type=float, default=3.5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-users', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    reports = []
+    for name in args.recommender or ['genre', 'user-similarity']:
+        reports.append(evaluate(
+            name, args.movies, args.ratings, k=args.k, test_fraction=args.test_fraction,
+            method=args.split, relevance_threshold=args.relevance_threshold,
+            workers=args.workers, max_users=args.max_users, seed=args.seed
+        ))
+    print_report(reports, args.k)
+
+
+if __name__ == '__main__':
+    main()
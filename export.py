@@ -0,0 +1,229 @@
+"""Bulk export of recommendations and movie statistics as columnar files.
+
+Recommendations are written in long form, one row per (user, rank) with the
+movie id, score and recommender name; movie statistics have one row per
+movie. Rows are produced and written one row group at a time, so memory use
+does not grow with the number of users.
+
+Parquet is written when pyarrow is installed. Otherwise ``.npz`` is used,
+with each row group stored as its own set of arrays (``read_export``
+concatenates them), or CSV on request:
+
+    python export.py --recommender genre-weighted --recommender user-similarity --n 10
+"""
+import argparse
+import csv
+import os
+import time
+import zipfile
+
+import numpy as np
+
+
+FORMATS = ('parquet', 'npz', 'csv')
+RECOMMENDATION_COLUMNS = ('user_id', 'rank', 'movie_id', 'score', 'recommender')
+MOVIE_STAT_COLUMNS = ('movie_id', 'title', 'average_rating', 'total_ratings')
+
+
+def default_format():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return 'npz'
+    return 'parquet'
+
+
+class ParquetWriter:
+    """Writes each batch of columns as one Parquet row group."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self._writer = None
+
+    def write(self, batch):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: batch[name] for name in self.columns})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            # Still leave a (schema-less) file behind for an empty export
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table({name: [] for name in self.columns}), self.path)
+        else:
+            self._writer.close()
+
+
+class NpzWriter:
+    """Stores every batch as ``<column>/<group>.npy`` members of one zip archive."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self._archive = zipfile.ZipFile(path, 'w', allowZip64=True)
+        self._groups = 0
+
+    def write(self, batch):
+        for name in self.columns:
+            with self._archive.open(f'{name}/{self._groups:06d}.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asarray(batch[name]), allow_pickle=False)
+        self._groups += 1
+
+    def close(self):
+        self._archive.close()
+
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, batch):
+        self._writer.writerows(zip(*(np.asarray(batch[name]).tolist() for name in self.columns)))
+
+    def close(self):
+        self._file.close()
+
+
+WRITERS = {'parquet': ParquetWriter, 'npz': NpzWriter, 'csv': CsvWriter}
+
+
+def open_writer(path, columns, file_format=None):
+    """Open a row-group writer; the format defaults to the path's extension."""
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip('.') or default_format()
+    if file_format not in WRITERS:
+        raise ValueError(f"Unknown export format '{file_format}', expected one of {FORMATS}")
+    return WRITERS[file_format](path, columns)
+
+
+def read_export(path):
+    """Read an export back into a dict of column arrays (for checks and tests)."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    if path.endswith('.csv'):
+        import pandas as pd
+
+        df = pd.read_csv(path)
+        return {name: df[name].to_numpy() for name in df.columns}
+
+    columns = {}
+    with zipfile.ZipFile(path) as archive:
+        for member in sorted(archive.namelist()):
+            name = member.split('/')[0]
+            with archive.open(member) as f:
+                columns.setdefault(name, []).append(np.lib.format.read_array(f))
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def recommendation_batches(recommender, user_ids, name, n=10, row_group_size=1024, **recommend_kwargs):
+    """Yield column batches of recommendations, ``row_group_size`` users at a time."""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), row_group_size):
+        chunk = user_ids[start:start + row_group_size]
+        scored = recommender.recommend_batch_with_scores(chunk, n, **recommend_kwargs)
+
+        rows = [(user_id, rank, movie.movie_id, score)
+                for user_id in chunk for rank, (movie, score) in enumerate(scored.get(user_id, ()), 1)]
+        user_column, rank_column, movie_column, score_column = zip(*rows) if rows else ((), (), (), ())
+        yield {
+            'user_id': np.array(user_column, dtype=np.int64),
+            'rank': np.array(rank_column, dtype=np.int16),
+            'movie_id': np.array(movie_column, dtype=np.int64),
+            'score': np.array(score_column, dtype=np.float64),
+            'recommender': np.full(len(rows), name),
+        }
+
+
+def movie_stat_batches(movies, row_group_size=65536):
+    movie_list = list(movies.values())
+    for start in range(0, len(movie_list), row_group_size):
+        chunk = movie_list[start:start + row_group_size]
+        yield {
+            'movie_id': np.array([movie.movie_id for movie in chunk], dtype=np.int64),
+            'title': np.array([str(movie.title) for movie in chunk], dtype=np.str_),
+            'average_rating': np.array([movie.average_rating for movie in chunk], dtype=np.float64),
+            'total_ratings': np.array([movie.total_ratings for movie in chunk], dtype=np.int64),
+        }
+
+
+def _write_batches(path, columns, batches, file_format):
+    writer = open_writer(path, columns, file_format)
+    rows = 0
+    try:
+        for batch in batches:
+            if len(batch[columns[0]]):
+                writer.write(batch)
+                rows += len(batch[columns[0]])
+    finally:
+        writer.close()
+    return rows
+
+
+def export_recommendations(recommender, user_ids, path, name, n=10, row_group_size=1024, file_format=None,
+                           **recommend_kwargs):
+    """Write top-n recommendations for every user; returns the number of rows written."""
+    batches = recommendation_batches(recommender, user_ids, name, n, row_group_size, **recommend_kwargs)
+    return _write_batches(path, RECOMMENDATION_COLUMNS, batches, file_format)
+
+
+def export_movie_stats(movies, path, row_group_size=65536, file_format=None):
+    """Write average_rating and total_ratings for every movie; returns the row count."""
+    return _write_batches(path, MOVIE_STAT_COLUMNS, movie_stat_batches(movies, row_group_size), file_format)
+
+
+def main():
+    from evaluation import RECOMMENDERS, build_recommender, resolve_recommender
+
+    parser = argparse.ArgumentParser(description="Export recommendations and movie statistics.")
+    parser.add_argument('--recommender', action='append',
+                        help=f"name ({', '.join(sorted(RECOMMENDERS))}) or module:Class; repeatable")
+    parser.add_argument('--movies', default=os.path.join('dataset', 'movies.csv'))
+    parser.add_argument('--ratings', default=os.path.join('dataset', 'ratings.csv'))
+    parser.add_argument('--out', default='exports')
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help="default: parquet if pyarrow is installed, else npz")
+    parser.add_argument('--n', type=int, default=10)
+    parser.add_argument('--row-group-size', type=int, default=1024, help="users per row group")
+    args = parser.parse_args()
+
+    from data_store import VersionedDataStore
+    from rating_log import DEFAULT_LOG_PATH
+
+    file_format = args.format or default_format()
+    os.makedirs(args.out, exist_ok=True)
+    data = VersionedDataStore.from_files(args.movies, args.ratings, rating_log_path=DEFAULT_LOG_PATH).snapshot()
+
+    path = os.path.join(args.out, f'movie_stats.{file_format}')
+    rows = export_movie_stats(data.movies, path, file_format=file_format)
+    print(f"Wrote {rows} movies to {path}")
+
+    user_ids = list(data.user_ratings)
+    for name in args.recommender or ['genre-weighted', 'user-similarity']:
+        cls, init_kwargs, recommend_kwargs = resolve_recommender(name)
+        recommender = build_recommender(cls, data, init_kwargs)
+        path = os.path.join(args.out, f'recommendations_{name.replace(":", "_")}.{file_format}')
+        start = time.perf_counter()
+        rows = export_recommendations(
+            recommender, user_ids, path, name, args.n, args.row_group_size, file_format, **recommend_kwargs
+        )
+        elapsed = time.perf_counter() - start
+        print(f"Wrote {rows} recommendations for {len(user_ids)} users to {path} "
+              f"({len(user_ids) / elapsed:.1f} users/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+
+
+# Ratings use a half-star scale from 0.5 to 5.0
+RATING_LEVELS = np.arange(1, 11) / 2.0
+
+
+def rating_arrays(user_ratings):
+    """Flatten a user_id -> {movie_id: rating} mapping into three parallel arrays."""
+    if hasattr(user_ratings, 'to_arrays'):
+        return user_ratings.to_arrays()
+
+    lengths = [len(ratings) for ratings in user_ratings.values()]
+    total = sum(lengths)
+    user_ids = np.repeat(np.fromiter(user_ratings.keys(), dtype=np.int64, count=len(lengths)), lengths)
+    movie_ids = np.fromiter(
+        (movie_id for ratings in user_ratings.values() for movie_id in ratings),
+        dtype=np.int64, count=total
+    )
+    ratings = np.fromiter(
+        (rating for ratings in user_ratings.values() for rating in ratings.values()),
+        dtype=np.float64, count=total
+    )
+    return user_ids, movie_ids, ratings
+
+
+def _level_index(rating):
+    """Half-star bucket at or below a rating (0 for 0.5, 9 for 5.0)."""
+    return int(min(max(math.floor(rating * 2) - 1, 0), len(RATING_LEVELS) - 1))
+
+
+class GenrePreferences:
+    """User x genre rating sums and counts, bucketed by half-star level.
+
+    Both arrays are cumulative from the top level down, so entry
+    ``[user, genre, level]`` covers every rating at or above
+    ``RATING_LEVELS[level]``. The statistics for any ``min_rating`` threshold
+    are therefore a single slice, and adding a rating touches only one user's
+    row.
+    """
+
+    def __init__(self, movies, user_ratings):
+        self.genres = sorted({genre for movie in movies.values() for genre in movie.get_genres()})
+        self.genre_index = {genre: i for i, genre in enumerate(self.genres)}
+
+        self.movie_ids = np.array(sorted(movies.keys()), dtype=np.int64)
+        self.movie_genres = np.zeros((len(self.movie_ids), len(self.genres)), dtype=bool)
+        for column, movie_id in enumerate(self.movie_ids.tolist()):
+            for genre in movies[movie_id].get_genres():
+                self.movie_genres[column, self.genre_index[genre]] = True
+        self._movie_columns = {movie_id: i for i, movie_id in enumerate(self.movie_ids.tolist())}
+
+        user_ids, movie_ids, ratings = rating_arrays(user_ratings)
+        self.user_ids, user_rows = np.unique(user_ids, return_inverse=True)
+        self.user_index = {user_id: i for i, user_id in enumerate(self.user_ids.tolist())}
+        self.counts, self.sums = self._accumulate(user_rows, movie_ids, ratings)
+
+    def _accumulate(self, user_rows, movie_ids, ratings):
+        n_genres = len(self.genres)
+        n_levels = len(RATING_LEVELS)
+        shape = (len(self.user_ids), n_genres, n_levels)
+
+        columns = np.searchsorted(self.movie_ids, movie_ids)
+        columns = np.minimum(columns, len(self.movie_ids) - 1)
+        known = self.movie_ids[columns] == movie_ids
+        user_rows, columns, ratings = user_rows[known], columns[known], ratings[known]
+        levels = np.clip(np.floor(ratings * 2).astype(np.int64) - 1, 0, n_levels - 1)
+
+        # One entry per (rating, genre of the rated movie) pair
+        rating_positions, genre_ids = np.nonzero(self.movie_genres[columns])
+        flat = (user_rows[rating_positions] * n_genres + genre_ids) * n_levels + levels[rating_positions]
+        size = shape[0] * n_genres * n_levels
+        counts = np.bincount(flat, minlength=size).reshape(shape)
+        sums = np.bincount(flat, weights=ratings[rating_positions], minlength=size).reshape(shape)
+
+        # Reverse cumulative sum over levels: entry l covers ratings >= level l
+        counts = np.ascontiguousarray(np.cumsum(counts[:, :, ::-1], axis=2)[:, :, ::-1])
+        sums = np.ascontiguousarray(np.cumsum(sums[:, :, ::-1], axis=2)[:, :, ::-1])
+        return counts, sums
+
+    def _user_row(self, user_id, create=False):
+        row = self.user_index.get(user_id)
+        if row is None and create:
+            row = len(self.user_ids)
+            self.user_index[user_id] = row
+            self.user_ids = np.append(self.user_ids, user_id)
+            self.counts = np.concatenate([self.counts, np.zeros((1,) + self.counts.shape[1:], dtype=self.counts.dtype)])
+            self.sums = np.concatenate([self.sums, np.zeros((1,) + self.sums.shape[1:], dtype=self.sums.dtype)])
+        return row
+
+    def movie_column(self, movie_id):
+        return self._movie_columns.get(movie_id)
+
+    def genre_stats(self, user_id, min_rating=3.5):
+        """Return (sums, counts) per genre over the user's ratings >= min_rating."""
+        row = self._user_row(user_id)
+        n_genres = len(self.genres)
+        if row is None:
+            return np.zeros(n_genres), np.zeros(n_genres, dtype=np.int64)
+
+        level = int(np.searchsorted(RATING_LEVELS, min_rating))
+        if level >= len(RATING_LEVELS):
+            return np.zeros(n_genres), np.zeros(n_genres, dtype=np.int64)
+        return self.sums[row, :, level], self.counts[row, :, level]
+
+    def genre_averages(self, user_id, min_rating=3.5):
+        """Average rating per genre (0 where the user has no qualifying ratings)."""
+        sums, counts = self.genre_stats(user_id, min_rating)
+        return np.divide(sums, counts, out=np.zeros(len(self.genres)), where=counts > 0)
+
+    def preferred_genres(self, user_id, min_rating=3.5):
+        sums, counts = self.genre_stats(user_id, min_rating)
+        rated = np.flatnonzero(counts)
+        averages = sums[rated] / counts[rated]
+        order = np.argsort(-averages, kind='stable')
+        return {self.genres[rated[i]]: float(averages[i]) for i in order}
+
+    def add_rating(self, user_id, movie_id, rating, old_rating=None):
+        """Fold a new or changed rating into the matrix."""
+        column = self._movie_columns.get(movie_id)
+        if column is None:
+            return
+
+        row = self._user_row(user_id, create=True)
+        genre_ids = np.flatnonzero(self.movie_genres[column])
+        if old_rating is not None:
+            old_level = _level_index(old_rating)
+            self.counts[row, genre_ids, :old_level + 1] -= 1
+            self.sums[row, genre_ids, :old_level + 1] -= old_rating
+
+        level = _level_index(rating)
+        self.counts[row, genre_ids, :level + 1] += 1
+        self.sums[row, genre_ids, :level + 1] += rating
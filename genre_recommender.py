@@ -1,32 +1,53 @@
+import numpy as np
+
+from genre_preferences import RATING_LEVELS, GenrePreferences
 from recommender import Recommender
 
 
+SCORING_MODES = ('rating', 'weighted')
+
+
 class GenreRecommender(Recommender):
-    def __init__(self, movies, user_ratings, genre_movies):
+    """Recommends movies from the genres a user rates highly.
+
+    ``scoring='rating'`` ranks every movie in a preferred genre by its average
+    rating. ``scoring='weighted'`` scores the whole catalogue at once as the
+    user's mean affinity for a movie's genres times the movie's Bayesian
+    average, where ``prior_weight`` pseudo-ratings at the global mean keep
+    movies with a handful of ratings from dominating.
+    """
+
+    def __init__(self, movies, user_ratings, genre_movies, scoring='rating', prior_weight=10.0):
         super().__init__(movies, user_ratings)
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode '{scoring}', expected one of {SCORING_MODES}")
         self.genre_movies = genre_movies
+        self.scoring = scoring
+        self.prior_weight = prior_weight
+        self.preferences = GenrePreferences(movies, user_ratings)
+        
+        movie_ids = self.preferences.movie_ids.tolist()
+        self.rating_sums = np.array([movies[movie_id].rating_sum for movie_id in movie_ids], dtype=np.float64)
+        self.rating_counts = np.array([movies[movie_id].total_ratings for movie_id in movie_ids], dtype=np.float64)
+        
+        # Each movie spreads a total weight of 1 evenly over its genres, so a
+        # product with an affinity vector is the mean affinity for the movie.
+        genre_counts = self.preferences.movie_genres.sum(axis=1, keepdims=True)
+        self.genre_weights = np.divide(
+            self.preferences.movie_genres, genre_counts,
+            out=np.zeros(self.preferences.movie_genres.shape), where=genre_counts > 0
+        )
     
     def get_user_preferred_genres(self, user_id, min_rating=3.5):
         if user_id not in self.user_ratings:
             return {}
         
-        genre_ratings = {}
-        
-        for movie_id, rating in self.user_ratings[user_id].items():
-            if rating >= min_rating and movie_id in self.movies:
-                movie = self.movies[movie_id]
-                for genre in movie.get_genres():
-                    if genre not in genre_ratings:
-                        genre_ratings[genre] = []
-                    genre_ratings[genre].append(rating)
-        
-        genre_averages = {}
-        for genre, ratings in genre_ratings.items():
-            genre_averages[genre] = sum(ratings) / len(ratings)
-        
-        return dict(sorted(genre_averages.items(), key=lambda x: x[1], reverse=True))
+        return self.preferences.preferred_genres(user_id, min_rating)
     
     def recommend(self, user_id, n=10):
+        if self.scoring == 'weighted':
+            return [movie for movie, _ in self._weighted_batch([user_id], n)[user_id]]
+        
         preferred_genres = self.get_user_preferred_genres(user_id)
         
         if not preferred_genres:
@@ -40,4 +61,79 @@ class GenreRecommender(Recommender):
             new_movies = genre_movie_ids - user_rated_movies
             candidate_movie_ids.update(new_movies)
         
-        return self.get_top_movies_by_rating(candidate_movie_ids, n)
\ No newline at end of file
+        return self.get_top_movies_by_rating(candidate_movie_ids, n)
+    
+    def bayesian_averages(self):
+        total = self.rating_counts.sum()
+        global_mean = self.rating_sums.sum() / total if total else 0.0
+        return (self.prior_weight * global_mean + self.rating_sums) / (self.prior_weight + self.rating_counts)
+    
+    def genre_affinities(self, user_ids, min_rating=3.5):
+        """Users x genres matrix of average liked rating per genre, scaled to [0, 1]."""
+        affinities = np.zeros((len(user_ids), len(self.preferences.genres)))
+        for i, user_id in enumerate(user_ids):
+            affinities[i] = self.preferences.genre_averages(user_id, min_rating)
+        return affinities / RATING_LEVELS[-1]
+    
+    def score_movies(self, user_ids, min_rating=3.5):
+        """Users x catalogue matrix of weighted scores, in preferences.movie_ids order."""
+        affinities = self.genre_affinities(user_ids, min_rating)
+        return (affinities @ self.genre_weights.T) * self.bayesian_averages()
+    
+    def recommend_batch(self, user_ids, n=10, chunk_size=256):
+        """Recommendations for many users in this instance's scoring mode, as {user_id: [Movie]}."""
+        if self.scoring == 'weighted':
+            scored = self._weighted_batch(user_ids, n, chunk_size)
+        else:
+            scored = self.recommend_batch_with_scores(user_ids, n)
+        return {user_id: [movie for movie, _ in pairs] for user_id, pairs in scored.items()}
+    
+    def recommend_batch_with_scores(self, user_ids, n=10):
+        if self.scoring == 'weighted':
+            return self._weighted_batch(user_ids, n)
+        return super().recommend_batch_with_scores(user_ids, n)
+    
+    def recommend_with_scores(self, user_id, n=10):
+        if self.scoring == 'weighted':
+            return self._weighted_batch([user_id], n)[user_id]
+        return super().recommend_with_scores(user_id, n)
+    
+    def _weighted_batch(self, user_ids, n=10, chunk_size=256):
+        user_ids = list(user_ids)
+        movie_ids = self.preferences.movie_ids
+        recommendations = {}
+        
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            scores = self.score_movies(chunk)
+            for row, user_id in enumerate(chunk):
+                rated = [self.preferences.movie_column(movie_id) for movie_id in self.user_ratings.get(user_id, {})]
+                rated = [column for column in rated if column is not None]
+                scores[row, rated] = 0.0
+            
+            k = min(n, scores.shape[1])
+            if k <= 0:
+                recommendations.update((user_id, []) for user_id in chunk)
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            
+            for row, user_id in enumerate(chunk):
+                positive = top_scores[row] > 0
+                recommendations[user_id] = [
+                    (self.movies[movie_id], score)
+                    for movie_id, score in zip(movie_ids[top[row][positive]].tolist(), top_scores[row][positive].tolist())
+                ]
+        
+        return recommendations
+    
+    def record_rating(self, user_id, movie_id, rating, old_rating=None):
+        self.preferences.add_rating(user_id, movie_id, rating, old_rating)
+        column = self.preferences.movie_column(movie_id)
+        if column is not None:
+            movie = self.movies[movie_id]
+            self.rating_sums[column] = movie.rating_sum
+            self.rating_counts[column] = movie.total_ratings
\ No newline at end of file
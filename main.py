@@ -1,6 +1,4 @@
-from data_loader import load_data
-from genre_recommender import GenreRecommender
-from user_similarity_recommender import UserSimilarityRecommender
+from data_loader import load_data, load_tag_index
 
 
 def print_movie_info(movie):
@@ -160,8 +158,8 @@ def list_available_genres(genre_movies):
     return sorted(genre_movies.keys())
 
 
-def demonstrate_movie_search(movies, genre_movies):
-    """Demonstrate movie search by title or genre."""
+def demonstrate_movie_search(movies, genre_movies, tag_index=None):
+    """Demonstrate movie search by title, genre, tag or external id."""
     print(f"\n{'='*70}")
     print("MOVIE SEARCH")
     print(f"{'='*70}")
@@ -169,7 +167,9 @@ def demonstrate_movie_search(movies, genre_movies):
     print("1. Search by title")
     print("2. Search by genre")
     print("3. List all genres")
-    print("4. Back to main menu")
+    print("4. Search by tag")
+    print("5. Find by IMDb/TMDb id")
+    print("6. Back to main menu")
     
     choice = input("\nEnter choice: ").strip()
     
@@ -218,13 +218,67 @@ def demonstrate_movie_search(movies, genre_movies):
             print(f"  {i}. {genre} ({movie_count} movies)")
     
     elif choice == '4':
+        if tag_index is None or len(tag_index) == 0:
+            print("Tag data is not available.")
+            return
+        
+        term = input("Enter tag to search: ").strip()
+        if not term:
+            print("Tag cannot be empty.")
+            return
+        
+        tags, results = tag_index.search(term)
+        results = [(movies[movie_id], count) for movie_id, count in results if movie_id in movies]
+        
+        if not results:
+            print(f"\nNo movies found tagged '{term}'")
+        else:
+            print(f"\nFound {len(results)} movie(s) tagged {', '.join(repr(tag) for tag in tags[:5])}"
+                  f"{' ...' if len(tags) > 5 else ''}:")
+            for i, (movie, count) in enumerate(results[:20], 1):  # Limit to first 20
+                print(f"\n{i}. Movie ID: {movie.movie_id} (tagged {count} time(s))")
+                print_movie_info(movie)
+            if len(results) > 20:
+                print(f"\n... and {len(results) - 20} more results")
+    
+    elif choice == '5':
+        if tag_index is None:
+            print("Link data is not available.")
+            return
+        
+        source = input("Id type (imdb/tmdb): ").strip().lower()
+        if source not in ('imdb', 'tmdb'):
+            print("Id type must be 'imdb' or 'tmdb'.")
+            return
+        try:
+            # IMDb ids are often written with their 'tt' prefix
+            external_id = int(input(f"Enter {source.upper()} id: ").strip().lower().removeprefix('tt'))
+        except ValueError:
+            print("Invalid id. Please enter a numeric id.")
+            return
+        
+        if source == 'imdb':
+            movie_id = tag_index.movie_for_imdb(external_id)
+        else:
+            movie_id = tag_index.movie_for_tmdb(external_id)
+        
+        if movie_id is None or movie_id not in movies:
+            print(f"\nNo movie found with {source.upper()} id {external_id}")
+        else:
+            print(f"\nMovie ID: {movie_id}")
+            print_movie_info(movies[movie_id])
+            top_tags = tag_index.movie_tags(movie_id)[:5]
+            if top_tags:
+                print(f"    Tags: {', '.join(tag for tag, _ in top_tags)}")
+    
+    elif choice == '6':
         return
     
     else:
         print("Invalid choice")
 
 
-def rate_movie(user_ratings, movies, user_movie_mapping):
+def rate_movie(user_ratings, movies, user_movie_mapping, recommenders=(), rating_log=None):
     """Allow user to rate a movie and update their profile."""
     try:
         print(f"\n{'='*70}")
@@ -238,10 +292,14 @@ def rate_movie(user_ratings, movies, user_movie_mapping):
             print("Invalid user ID. Please enter a numeric value.")
             return
         
-        # Check if user exists, if not create them
+        from rating_log import MAX_ID
+        
+        if not 0 <= user_id <= MAX_ID:
+            print(f"User ID must be between 0 and {MAX_ID}.")
+            return
+        
+        # New users get a profile once their first rating is saved
         if user_id not in user_ratings:
-            user_ratings[user_id] = {}
-            user_movie_mapping[user_id] = set()
             print(f"Welcome new user {user_id}!")
         else:
             rated_count = len(user_ratings[user_id])
@@ -265,7 +323,8 @@ def rate_movie(user_ratings, movies, user_movie_mapping):
         print(f"Genres: {', '.join(movie.get_genres())}")
         
         # Check if already rated
-        if movie_id in user_ratings[user_id]:
+        old_rating = None
+        if movie_id in user_ratings.get(user_id, {}):
             old_rating = user_ratings[user_id][movie_id]
             print(f"Current rating: {old_rating}")
             
@@ -294,12 +353,26 @@ def rate_movie(user_ratings, movies, user_movie_mapping):
             print("Invalid rating. Please enter a numeric value.")
             return
         
+        # Persist the rating first, so a failed write leaves memory untouched
+        if rating_log is not None:
+            rating_log.append(user_id, movie_id, rating)
+        
         # Update user profile
+        if user_id not in user_ratings:
+            user_ratings[user_id] = {}
+            user_movie_mapping[user_id] = set()
         user_ratings[user_id][movie_id] = rating
         user_movie_mapping[user_id].add(movie_id)
         
-        # Update movie's average rating
-        movie.add_rating(rating)
+        # Update movie's average rating, replacing the user's previous rating if any
+        if old_rating is None:
+            movie.add_rating(rating)
+        else:
+            movie.update_rating(old_rating, rating)
+        
+        # Keep any cached recommender state in step with the new rating
+        for recommender in recommenders:
+            recommender.record_rating(user_id, movie_id, rating, old_rating)
         
         print(f"\n✓ Successfully rated '{movie.title}' with {rating} stars")
         print(f"✓ Updated average rating: {movie.average_rating:.2f} ({movie.total_ratings} ratings)")
@@ -476,7 +549,7 @@ def compare_recommenders(user_id, genre_recommender, user_similarity_recommender
         for movie_id in list(only_similarity)[:3]:
             if movie_id in movies:
                 print(f"    • {movies[movie_id].title}")
-def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping):
+def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log=None, tag_index=None):
     try:
         print("\nMAIN MENU")
         print("1. Request recommendations")
@@ -484,7 +557,7 @@ def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratin
         print("3. User similarity-based recommendations")
         print("4. Compare recommendation methods")
         print("5. User similarity (recursive depth)")
-        print("6. Search movies (by title or genre)")
+        print("6. Search movies (by title, genre or tag)")
         print("7. Rate a movie (update profile)")
         print("8. View user ratings")
         print("9. Show movie info by id")
@@ -493,7 +566,7 @@ def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratin
         choice = input("Enter choice: ").strip()
         if choice == '1':
             request_recommendations(genre_recommender, user_similarity_recommender, movies, user_ratings)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '2':
             try:
                 user_id = int(input('Enter user id (blank for first user): ').strip() or min(user_ratings.keys()))
@@ -503,7 +576,7 @@ def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratin
                 print(f'User {user_id} not found. Using first available user.')
                 user_id = min(user_ratings.keys())
             demonstrate_genre_recommender(user_id, genre_recommender, movies, user_ratings)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '3':
             try:
                 user_id = int(input('Enter user id (blank for first user): ').strip() or min(user_ratings.keys()))
@@ -513,7 +586,7 @@ def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratin
                 print(f'User {user_id} not found. Using first available user.')
                 user_id = min(user_ratings.keys())
             demonstrate_user_similarity_recommender(user_id, user_similarity_recommender, movies, user_ratings)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '4':
             try:
                 user_id = int(input('Enter user id (blank for first user): ').strip() or min(user_ratings.keys()))
@@ -523,7 +596,7 @@ def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratin
                 print(f'User {user_id} not found. Using first available user.')
                 user_id = min(user_ratings.keys())
             compare_recommenders(user_id, genre_recommender, user_similarity_recommender, movies, user_ratings)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '5':
             try:
                 user_id = int(input('Enter user id (blank for first user): ').strip() or min(user_ratings.keys()))
@@ -539,40 +612,40 @@ def main_menu(genre_recommender, user_similarity_recommender, movies, user_ratin
             except Exception:
                 depth = 2
             demonstrate_user_similarity_recommender(user_id, user_similarity_recommender, movies, user_ratings, recursive_depth=depth)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '6':
-            demonstrate_movie_search(movies, genre_movies)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            demonstrate_movie_search(movies, genre_movies, tag_index)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '7':
-            rate_movie(user_ratings, movies, user_movie_mapping)
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            rate_movie(user_ratings, movies, user_movie_mapping, (genre_recommender, user_similarity_recommender), rating_log)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '8':
             try:
                 user_id = int(input('Enter user id to view ratings: ').strip())
                 view_user_ratings(user_id, user_ratings, movies)
             except Exception as e:
                 print(f"Error: {e}")
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '9':
             try:
                 movie_id_str = input('Enter movie id: ').strip()
                 movie_id = int(movie_id_str)
             except Exception:
                 print('Invalid movie id input. Please enter a numeric id.')
-                return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+                return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
 
             if movie_id in movies:
                 print_movie_info(movies[movie_id])
             else:
                 print(f'Movie id {movie_id} not found in the dataset.')
 
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
         elif choice == '10':
             print('Exiting.')
             return
         else:
             print('Invalid choice')
-            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+            return main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
     except KeyboardInterrupt:
         print('\nInterrupted. Exiting menu.')
         return
@@ -584,10 +657,14 @@ def main():
     print("="*70)
 
     print("\nLoading data...")
+    from rating_log import DEFAULT_LOG_PATH, RatingLog
+
     try:
         movies, user_ratings, user_movie_mapping, genre_movies = load_data(
             'dataset/movies.csv',
-            'dataset/ratings.csv'
+            'dataset/ratings.csv',
+            lazy=True,
+            rating_log_path=DEFAULT_LOG_PATH
         )
     except FileNotFoundError as e:
         print(f"Dataset file not found: {e}")
@@ -601,7 +678,19 @@ def main():
     print(f"✓ Loaded ratings from {len(user_ratings)} users")
     print(f"✓ Mapped {len(genre_movies)} genres")
 
+    try:
+        tag_index = load_tag_index('dataset/movies.csv', 'dataset/ratings.csv', lazy=True)
+        print(f"✓ Indexed {len(tag_index)} tags")
+    except Exception as e:
+        print(f"Warning: tag search is unavailable ({e})")
+        tag_index = None
+
     print("\nInitializing recommendation engines...")
+    # The recommenders pull in numpy, so they are imported only once the menu
+    # is about to need them rather than when this module is imported.
+    from genre_recommender import GenreRecommender
+    from user_similarity_recommender import UserSimilarityRecommender
+
     genre_recommender = GenreRecommender(movies, user_ratings, genre_movies)
     user_similarity_recommender = UserSimilarityRecommender(
         movies, user_ratings, user_movie_mapping
@@ -625,10 +714,19 @@ def main():
     print(f"{'='*70}\n")
 
     try:
-        main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping)
+        rating_log = RatingLog(DEFAULT_LOG_PATH)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ratings will not be saved ({e})")
+        rating_log = None
+
+    try:
+        main_menu(genre_recommender, user_similarity_recommender, movies, user_ratings, genre_movies, user_movie_mapping, rating_log, tag_index)
     except KeyboardInterrupt:
         print('\nInterrupted. Exiting program.')
         return
+    finally:
+        if rating_log is not None:
+            rating_log.close()
 
 
 if __name__ == "__main__":
@@ -12,6 +12,15 @@ class Movie:
         self.rating_sum += rating
         self.average_rating = self.rating_sum / self.total_ratings
     
+    def update_rating(self, old_rating, new_rating):
+        self.rating_sum += new_rating - old_rating
+        self.average_rating = self.rating_sum / self.total_ratings
+    
+    def set_rating_stats(self, total_ratings, rating_sum):
+        self.total_ratings = total_ratings
+        self.rating_sum = rating_sum
+        self.average_rating = rating_sum / total_ratings if total_ratings else 0.0
+    
     def get_genres(self):
         return self.genres
     
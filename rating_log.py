@@ -0,0 +1,288 @@
+"""Append-only binary log of rating updates.
+
+Every rating entered during a session is appended as a fixed-width record
+(user id, movie id, rating, timestamp) so it survives a restart. On startup
+the log is replayed on top of the base data, and ``python rating_log.py
+compact`` folds it into ``ratings.csv`` and empties it.
+"""
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, compaction is not guarded
+    fcntl = None
+
+
+MAGIC = b'MRLOG01\n'
+RECORD = struct.Struct('<iifq')
+RECORD_DTYPE = np.dtype([
+    ('user_id', '<i4'),
+    ('movie_id', '<i4'),
+    ('rating', '<f4'),
+    ('timestamp', '<i8'),
+])
+DEFAULT_LOG_PATH = os.path.join('dataset', 'ratings.log')
+# Ids are stored as signed 32-bit integers
+MAX_ID = np.iinfo(np.int32).max
+
+
+class RatingLog:
+    """Writer for the rating log.
+
+    Each record is flushed to the OS as soon as it is appended, so a crashed
+    process loses nothing; ``os.fsync`` is batched every ``sync_every``
+    records (and on close) to bound what a power loss can take.
+
+    An open log holds a shared lock on the file, so ``compact`` (which needs
+    an exclusive one) cannot run while any session is writing to it.
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH, sync_every=64):
+        self.path = path
+        self.sync_every = sync_every
+        self._pending = 0
+
+        _check_header(path)
+        self._file = open(path, 'ab')
+        if fcntl is not None:
+            # Waits only while a compaction is in progress
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+        else:
+            # Drop a torn record left by a crash mid-write
+            excess = (self._file.tell() - len(MAGIC)) % RECORD.size
+            if excess:
+                self._file.truncate(self._file.tell() - excess)
+
+    def append(self, user_id, movie_id, rating, timestamp=None):
+        for name, value in (('user id', user_id), ('movie id', movie_id)):
+            if not 0 <= value <= MAX_ID:
+                raise ValueError(f"{name} {value} is outside the supported range 0-{MAX_ID}")
+        if timestamp is None:
+            timestamp = int(time.time())
+        self._file.write(RECORD.pack(user_id, movie_id, rating, timestamp))
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _check_header(path):
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(len(MAGIC))
+    except FileNotFoundError:
+        return
+    if header and header != MAGIC:
+        raise ValueError(f"{path} is not a rating log")
+
+
+def read_rating_log(path):
+    """Return every complete record in the log as a structured array."""
+    _check_header(path)
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return np.empty(0, dtype=RECORD_DTYPE)
+
+    count = max(size - len(MAGIC), 0) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.fromfile(path, dtype=RECORD_DTYPE, count=count, offset=len(MAGIC))
+
+
+def _pair_keys(user_ids, movie_ids):
+    return (np.asarray(user_ids, dtype=np.int64) << 32) | (np.asarray(movie_ids, dtype=np.int64) & 0xFFFFFFFF)
+
+
+def latest_updates(records):
+    """Collapse the log to the last rating per (user, movie), in first-seen order.
+
+    Returns (records, first_sequence) where ``first_sequence`` is the log
+    position at which each pair first appeared.
+    """
+    if len(records) == 0:
+        return records, np.empty(0, dtype=np.int64)
+
+    keys = _pair_keys(records['user_id'], records['movie_id'])
+    order = np.lexsort((np.arange(len(records)), keys))
+    sorted_keys = keys[order]
+    group_end = np.append(sorted_keys[1:] != sorted_keys[:-1], True)
+    group_start = np.insert(sorted_keys[1:] != sorted_keys[:-1], 0, True)
+
+    last = order[group_end]
+    first = order[group_start]
+    first_seen = np.argsort(first, kind='stable')
+    return records[last[first_seen]], first[first_seen]
+
+
+def merge_rating_updates(user_ids, movie_ids, ratings, records, timestamps=None):
+    """Apply log records to base rating arrays.
+
+    Existing (user, movie) pairs are updated in place and new pairs are
+    appended in the order they first appear in the log, mirroring how a dict
+    of ratings behaves. Returns (user_ids, movie_ids, ratings, timestamps);
+    timestamps is None unless base timestamps are given.
+    """
+    updates, _ = latest_updates(records)
+    ratings = np.array(ratings, dtype=np.float64)
+    if timestamps is not None:
+        timestamps = np.array(timestamps, dtype=np.int64)
+    if len(updates) == 0:
+        return np.asarray(user_ids), np.asarray(movie_ids), ratings, timestamps
+
+    base_keys = _pair_keys(user_ids, movie_ids)
+    update_keys = _pair_keys(updates['user_id'], updates['movie_id'])
+    base_order = np.argsort(base_keys, kind='stable')
+    positions = np.searchsorted(base_keys[base_order], update_keys)
+    positions = np.minimum(positions, max(len(base_keys) - 1, 0))
+    exists = np.zeros(len(updates), dtype=bool)
+    if len(base_keys):
+        exists = base_keys[base_order[positions]] == update_keys
+
+    targets = base_order[positions[exists]]
+    ratings[targets] = updates['rating'][exists]
+    if timestamps is not None:
+        timestamps[targets] = updates['timestamp'][exists]
+
+    new = updates[~exists]
+    merged = (
+        np.concatenate([np.asarray(user_ids, dtype=np.int64), new['user_id'].astype(np.int64)]),
+        np.concatenate([np.asarray(movie_ids, dtype=np.int64), new['movie_id'].astype(np.int64)]),
+        np.concatenate([ratings, new['rating'].astype(np.float64)]),
+    )
+    if timestamps is not None:
+        timestamps = np.concatenate([timestamps, new['timestamp']])
+    return merged + (timestamps,)
+
+
+def replay_into(user_ratings, user_movie_mapping, movies, records):
+    """Apply log records to in-memory rating dicts and Movie aggregates."""
+    updates, _ = latest_updates(records)
+    for user_id, movie_id, rating in zip(
+        updates['user_id'].tolist(), updates['movie_id'].tolist(), updates['rating'].tolist()
+    ):
+        if user_id not in user_ratings:
+            user_ratings[user_id] = {}
+            user_movie_mapping[user_id] = set()
+        old_rating = user_ratings[user_id].get(movie_id)
+        user_ratings[user_id][movie_id] = rating
+        user_movie_mapping[user_id].add(movie_id)
+
+        movie = movies.get(movie_id)
+        if movie is None:
+            continue
+        if old_rating is None:
+            movie.add_rating(rating)
+        else:
+            movie.update_rating(old_rating, rating)
+
+
+def _line_terminator(path):
+    """The line ending used by a text file (CRLF or LF), judged by its first line."""
+    with open(path, 'rb') as f:
+        first_line = f.readline()
+    return '\r\n' if first_line.endswith(b'\r\n') else '\n'
+
+
+def compact(movies_path, ratings_path, log_path=DEFAULT_LOG_PATH, cache_dir=None):
+    """Merge the log into ratings.csv, rebuild the snapshot and empty the log.
+
+    The CSV is replaced atomically. Replaying a log onto data that already
+    contains it is a no-op, so a crash before the log is emptied is harmless.
+    Raises RuntimeError if a running session has the log open. Returns the
+    number of log records folded in.
+    """
+    import pandas as pd
+
+    from data_loader import load_movies
+    from snapshot import load_or_build_snapshot
+
+    if not os.path.exists(log_path):
+        return 0
+
+    with open(log_path, 'r+b') as log_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(log_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError(f"{log_path} is open in another session; close it before compacting")
+
+        records = read_rating_log(log_path)
+        if len(records) == 0:
+            return 0
+
+        ratings_df = pd.read_csv(ratings_path)
+        user_ids, movie_ids, ratings, timestamps = merge_rating_updates(
+            ratings_df['userId'].to_numpy(dtype=np.int64),
+            ratings_df['movieId'].to_numpy(dtype=np.int64),
+            ratings_df['rating'].to_numpy(dtype=np.float64),
+            records,
+            timestamps=ratings_df['timestamp'].to_numpy(dtype=np.int64),
+        )
+        merged_df = pd.DataFrame({
+            'userId': user_ids,
+            'movieId': movie_ids,
+            'rating': ratings,
+            'timestamp': timestamps,
+        })
+
+        temp_path = ratings_path + '.tmp'
+        merged_df.to_csv(temp_path, index=False, lineterminator=_line_terminator(ratings_path))
+        os.replace(temp_path, ratings_path)
+
+        load_or_build_snapshot(movies_path, ratings_path, load_movies, cache_dir)
+
+        log_file.seek(0)
+        log_file.write(MAGIC)
+        log_file.truncate()
+        log_file.flush()
+        os.fsync(log_file.fileno())
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the rating update log.")
+    parser.add_argument('command', choices=['compact', 'stats'])
+    parser.add_argument('--log', default=DEFAULT_LOG_PATH)
+    parser.add_argument('--movies', default=os.path.join('dataset', 'movies.csv'))
+    parser.add_argument('--ratings', default=os.path.join('dataset', 'ratings.csv'))
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        records = read_rating_log(args.log)
+        updates, _ = latest_updates(records)
+        print(f"{len(records)} records, {len(updates)} distinct (user, movie) pairs")
+    else:
+        try:
+            count = compact(args.movies, args.ratings, args.log)
+        except RuntimeError as e:
+            parser.exit(1, f"Error: {e}\n")
+        print(f"Compacted {count} records into {args.ratings}")
+
+
+if __name__ == '__main__':
+    main()
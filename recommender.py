@@ -10,6 +10,17 @@ class Recommender(ABC):
     def recommend(self, user_id, n=10):
         pass
     
+    def record_rating(self, user_id, movie_id, rating, old_rating=None):
+        pass
+    
+    def recommend_with_scores(self, user_id, n=10):
+        """Return [(Movie, score)]; by default the score is the average rating."""
+        return [(movie, movie.average_rating) for movie in self.recommend(user_id, n)]
+    
+    def recommend_batch_with_scores(self, user_ids, n=10, **kwargs):
+        """Scored recommendations for many users, returned as {user_id: [(Movie, score)]}."""
+        return {user_id: self.recommend_with_scores(user_id, n, **kwargs) for user_id in user_ids}
+    
     def get_user_rated_movies(self, user_id):
         if user_id in self.user_ratings:
             return set(self.user_ratings[user_id].keys())
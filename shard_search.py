@@ -0,0 +1,285 @@
+"""Scatter-gather Jaccard neighbour search over hash-partitioned users.
+
+Users are assigned to shards by a multiplicative hash of their id. Each shard
+is a worker process that holds only its own users' ratings, indexed by movie,
+and answers two requests against its partition: "top-k most similar users to
+this rated-movie set" and "the movies these users liked".
+``ShardedNeighborIndex`` is the coordinator: it sends a request to every
+shard over a pipe, waits for all the partial answers and merges them. Because
+every shard returns its best users in the same total order (similarity
+descending, then user id), the merged top-k is exact.
+
+The coordinator reads the ratings once to partition them; after that a
+recommendation needs only the query user's own profile, so a coordinator
+whose ratings are loaded lazily keeps just its bounded profile cache.
+"""
+import heapq
+import multiprocessing
+
+import numpy as np
+
+from genre_preferences import rating_arrays
+
+
+# Knuth's multiplicative hash spreads consecutive user ids across shards
+_HASH_MULTIPLIER = 2654435761
+
+
+def shard_of(user_ids, n_shards):
+    """Shard number of each user id (array in, array out)."""
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    return ((user_ids * _HASH_MULTIPLIER) & 0xFFFFFFFF) % n_shards
+
+
+def _range_entries(starts, lengths):
+    """Indices covering every [start, start + length) range, range by range."""
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+class ShardPartition:
+    """The ratings of one shard's users, indexed both by user and by movie.
+
+    Ratings are kept as flat (user, movie, rating) arrays. Added ratings are
+    buffered and folded in on the next request, so a burst of writes costs
+    one rebuild. A partition holding every user is also the single-process
+    neighbour index of ``UserSimilarityRecommender``.
+    """
+
+    def __init__(self, user_ids, movie_ids, ratings):
+        self._user_ids = np.asarray(user_ids, dtype=np.int64)
+        self._movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self._ratings = np.asarray(ratings, dtype=np.float64)
+        self._added = []
+        self._build()
+
+    def _build(self):
+        if self._added:
+            added = np.array(self._added, dtype=np.float64).reshape(-1, 3)
+            self._user_ids = np.concatenate([self._user_ids, added[:, 0].astype(np.int64)])
+            self._movie_ids = np.concatenate([self._movie_ids, added[:, 1].astype(np.int64)])
+            self._ratings = np.concatenate([self._ratings, added[:, 2]])
+            self._added = []
+
+        # One entry per (user, movie), keeping the latest rating; duplicates
+        # would otherwise count twice in an intersection
+        keys = (self._user_ids << 32) | (self._movie_ids & 0xFFFFFFFF)
+        keys, last = np.unique(keys[::-1], return_index=True)
+        self._ratings = self._ratings[::-1][last]
+        self._user_ids, self._movie_ids = keys >> 32, keys & 0xFFFFFFFF
+
+        # Entries are now sorted by user, so each user's ratings are one slice
+        self.user_ids, user_rows, self.sizes = np.unique(self._user_ids, return_inverse=True, return_counts=True)
+        self.user_rows = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self.user_offsets = np.zeros(len(self.user_ids) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.user_offsets[1:])
+
+        order = np.argsort(self._movie_ids, kind='stable')
+        self.indexed_movies, counts = np.unique(self._movie_ids[order], return_counts=True)
+        self.movie_offsets = np.zeros(len(self.indexed_movies) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.movie_offsets[1:])
+        self.movie_users = user_rows[order]
+
+    def add(self, user_id, movie_id, rating):
+        self._added.append((user_id, movie_id, rating))
+
+    def user_movies(self, user_id):
+        """Movie ids the user has rated, in ascending order (empty for unknown users)."""
+        if self._added:
+            self._build()
+
+        row = self.user_rows.get(user_id)
+        if row is None:
+            return self._movie_ids[:0]
+        return self._movie_ids[self.user_offsets[row]:self.user_offsets[row + 1]]
+
+    def similarities(self, query_movie_ids):
+        """Jaccard similarity of the query to every user, aligned with ``user_ids``."""
+        if self._added:
+            self._build()
+
+        query = np.unique(np.asarray(query_movie_ids, dtype=np.int64))
+        if len(query) == 0 or len(self.indexed_movies) == 0:
+            return np.zeros(len(self.user_ids))
+
+        positions = np.searchsorted(self.indexed_movies, query)
+        positions = np.minimum(positions, len(self.indexed_movies) - 1)
+        positions = positions[self.indexed_movies[positions] == query]
+        starts = self.movie_offsets[positions]
+        entries = _range_entries(starts, self.movie_offsets[positions + 1] - starts)
+
+        intersections = np.bincount(self.movie_users[entries], minlength=len(self.user_ids))
+        return intersections / (len(query) + self.sizes - intersections)
+
+    def top_k(self, query_movie_ids, k, exclude_user_id=None):
+        """Return [(user_id, similarity)] for the k users most similar to the query."""
+        if k <= 0:
+            return []
+
+        similarities = self.similarities(query_movie_ids)
+        exclude_row = self.user_rows.get(exclude_user_id)
+        if exclude_row is not None:
+            similarities[exclude_row] = 0.0
+
+        candidates = np.flatnonzero(similarities > 0)
+        if len(candidates) > k:
+            threshold = np.partition(similarities[candidates], -k)[-k]
+            candidates = candidates[similarities[candidates] >= threshold]
+        order = np.lexsort((self.user_ids[candidates], -similarities[candidates]))[:k]
+        return list(zip(self.user_ids[candidates[order]].tolist(), similarities[candidates[order]].tolist()))
+
+    def liked_movies(self, user_ids, weights=None, min_rating=3.5):
+        """Return (movie_ids, weights) of every rating >= min_rating by the given users.
+
+        ``weights`` repeats each user's weight once per liked movie, or is
+        None when no weights are given.
+        """
+        if self._added:
+            self._build()
+
+        rows = [self.user_rows.get(user_id) for user_id in user_ids]
+        known = [i for i, row in enumerate(rows) if row is not None]
+        rows = np.array([rows[i] for i in known], dtype=np.int64)
+        starts = self.user_offsets[rows]
+        lengths = self.sizes[rows]
+        entries = _range_entries(starts, lengths)
+
+        liked = self._ratings[entries] >= min_rating
+        entry_weights = None
+        if weights is not None:
+            user_weights = np.asarray(weights, dtype=np.float64)[known]
+            entry_weights = np.repeat(user_weights, lengths)[liked]
+        return self._movie_ids[entries][liked], entry_weights
+
+
+def _serve_shard(connection):
+    """Worker loop: receive the partition, then answer requests until closed."""
+    partition = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        command = message[0]
+        if command == 'load':
+            partition = ShardPartition(*message[1:])
+            connection.send(len(partition.user_ids))
+        elif command in ('query', 'liked'):
+            method = partition.top_k if command == 'query' else partition.liked_movies
+            try:
+                connection.send(method(*message[1:]))
+            except Exception as e:
+                connection.send(e)
+        elif command == 'add':
+            partition.add(*message[1:])
+        elif command == 'close':
+            break
+    connection.close()
+
+
+class ShardedNeighborIndex:
+    """Coordinator for ``n_shards`` local shard worker processes.
+
+    Each worker is sent only its own partition and is reached over a
+    ``multiprocessing`` pipe; the protocol is plain picklable tuples, so the
+    same loop can serve a ``multiprocessing.connection`` socket on another
+    host.
+    """
+
+    def __init__(self, user_ids, movie_ids, ratings, n_shards=4):
+        """Partition parallel (user id, movie id, rating) arrays over new shard workers."""
+        if n_shards < 1:
+            raise ValueError("n_shards must be at least 1")
+        self.n_shards = n_shards
+        self._connections = []
+        self._processes = []
+
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        shards = shard_of(user_ids, n_shards)
+
+        try:
+            for shard in range(n_shards):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_serve_shard, args=(child,), daemon=True)
+                process.start()
+                child.close()
+                self._connections.append(parent)
+                self._processes.append(process)
+
+                in_shard = shards == shard
+                parent.send(('load', user_ids[in_shard], movie_ids[in_shard], ratings[in_shard]))
+            self.shard_sizes = [connection.recv() for connection in self._connections]
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def from_ratings(cls, user_ratings, n_shards=4):
+        return cls(*rating_arrays(user_ratings), n_shards)
+
+    def _gather(self, requests):
+        """Send {shard: message} to the shards, then collect their answers in order."""
+        # Scatter to every shard before waiting on any, so they work in parallel
+        for shard, message in requests.items():
+            self._connections[shard].send(message)
+        answers = [self._connections[shard].recv() for shard in requests]
+        for answer in answers:
+            if isinstance(answer, Exception):
+                raise answer
+        return answers
+
+    def find_similar_users(self, movie_ids, n=20, exclude_user_id=None):
+        """Top-n [(user_id, similarity)] across all shards for a rated-movie set."""
+        query = np.fromiter(movie_ids, dtype=np.int64)
+        partials = self._gather({
+            shard: ('query', query, n, exclude_user_id) for shard in range(self.n_shards)
+        })
+        merged = heapq.merge(*partials, key=lambda x: (-x[1], x[0]))
+        return [pair for pair, _ in zip(merged, range(n))]
+
+    def liked_movies(self, user_ids, weights=None, min_rating=3.5):
+        """Return (movie_ids, weights) of the given users' ratings >= min_rating.
+
+        Each user is looked up on its own shard; ``weights`` repeats each
+        user's weight per liked movie, or is None when no weights are given.
+        """
+        user_ids = list(user_ids)
+        shards = shard_of(user_ids, self.n_shards).tolist()
+        requests = {}
+        for shard in sorted(set(shards)):
+            members = [i for i, s in enumerate(shards) if s == shard]
+            shard_weights = [weights[i] for i in members] if weights is not None else None
+            requests[shard] = ('liked', [user_ids[i] for i in members], shard_weights, min_rating)
+        if not requests:
+            return np.empty(0, dtype=np.int64), (np.empty(0) if weights is not None else None)
+
+        answers = self._gather(requests)
+        movie_ids = np.concatenate([movies for movies, _ in answers])
+        if weights is None:
+            return movie_ids, None
+        return movie_ids, np.concatenate([entry_weights for _, entry_weights in answers])
+
+    def add_rating(self, user_id, movie_id, rating):
+        shard = int(shard_of([user_id], self.n_shards)[0])
+        self._connections[shard].send(('add', user_id, movie_id, rating))
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(('close',))
+            except (OSError, ValueError):
+                pass
+            connection.close()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,402 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from movie import Movie
+from rating_log import merge_rating_updates
+from tag_index import build_link_arrays, build_tag_arrays
+
+
+SNAPSHOT_VERSION = 3
+CATALOGUE_ARRAYS = (
+    'catalogue_ids', 'titles', 'genres', 'imdb_ids', 'tmdb_ids',
+    'tag_names', 'movie_tag_offsets', 'movie_tag_ids', 'movie_tag_counts',
+)
+RATING_ARRAYS = (
+    'user_ids', 'offsets', 'movie_ids', 'ratings',
+    'stat_movie_ids', 'rating_sums', 'rating_counts',
+)
+SNAPSHOT_ARRAYS = CATALOGUE_ARRAYS + RATING_ARRAYS
+
+
+class DatasetSnapshot:
+    """Columnar copy of the dataset that can be loaded without pandas.
+
+    Holds the movie catalogue (with tag vectors and external ids, see
+    tag_index), ratings sorted by user with an offset index and per-movie
+    rating aggregates. A user's ratings live in
+    ``movie_ids[offsets[i]:offsets[i + 1]]`` and the matching slice of
+    ``ratings``, where ``i`` is the user's position in ``user_ids``. Within a
+    user, ratings keep their order from the CSV file.
+    """
+
+    def __init__(self, **arrays):
+        for name in SNAPSHOT_ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_csv(cls, movies, ratings_path, tags_path=None, links_path=None):
+        """Build a snapshot from loaded movies and the CSV files (needs pandas)."""
+        import pandas as pd
+
+        try:
+            ratings_df = pd.read_csv(ratings_path, usecols=['userId', 'movieId', 'rating'])
+        except pd.errors.EmptyDataError:
+            raise ValueError("The ratings CSV file is empty")
+        except ValueError as e:
+            raise ValueError(f"Error parsing ratings CSV file: {e}")
+
+        for column in ('userId', 'movieId', 'rating'):
+            ratings_df[column] = pd.to_numeric(ratings_df[column], errors='coerce')
+        ratings_df = ratings_df.dropna()
+        ratings_df = ratings_df.drop_duplicates(subset=['userId', 'movieId'], keep='last')
+
+        if ratings_df.empty:
+            raise ValueError("No valid ratings could be loaded from the dataset")
+
+        return cls.from_arrays(
+            movies,
+            ratings_df['userId'].to_numpy(dtype=np.int64),
+            ratings_df['movieId'].to_numpy(dtype=np.int64),
+            ratings_df['rating'].to_numpy(dtype=np.float64),
+            tags_path=tags_path,
+            links_path=links_path
+        )
+
+    @classmethod
+    def from_arrays(cls, movies, user_ids, movie_ids, ratings, tags_path=None, links_path=None):
+        catalogue_ids = np.array(list(movies.keys()), dtype=np.int64)
+        catalogue = {
+            'catalogue_ids': catalogue_ids,
+            'titles': np.array([str(movie.title) for movie in movies.values()], dtype=np.str_),
+            'genres': np.array(['|'.join(movie.get_genres()) for movie in movies.values()], dtype=np.str_),
+        }
+        catalogue.update(build_tag_arrays(catalogue_ids, tags_path))
+        catalogue.update(build_link_arrays(catalogue_ids, links_path))
+        return cls._with_catalogue(catalogue, user_ids, movie_ids, ratings)
+
+    @classmethod
+    def _with_catalogue(cls, catalogue, user_ids, movie_ids, ratings):
+        order = np.argsort(user_ids, kind='stable')
+        sorted_users = user_ids[order]
+        unique_users, counts = np.unique(sorted_users, return_counts=True)
+        offsets = np.zeros(len(unique_users) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        stat_movie_ids, inverse = np.unique(movie_ids, return_inverse=True)
+        rating_sums = np.bincount(inverse, weights=ratings, minlength=len(stat_movie_ids))
+        rating_counts = np.bincount(inverse, minlength=len(stat_movie_ids))
+
+        return cls(
+            user_ids=unique_users, offsets=offsets, movie_ids=movie_ids[order], ratings=ratings[order],
+            stat_movie_ids=stat_movie_ids, rating_sums=rating_sums, rating_counts=rating_counts,
+            **catalogue
+        )
+
+    def catalogue(self):
+        return {name: getattr(self, name) for name in CATALOGUE_ARRAYS}
+
+    def with_ratings(self, user_ids, movie_ids, ratings):
+        """Return a new snapshot with this catalogue and the given ratings."""
+        return self._with_catalogue(
+            self.catalogue(),
+            np.asarray(user_ids, dtype=np.int64), np.asarray(movie_ids, dtype=np.int64),
+            np.asarray(ratings, dtype=np.float64)
+        )
+
+    def with_updates(self, records):
+        """Return a new snapshot with rating log records applied on top of this one."""
+        user_ids, movie_ids, ratings, _ = merge_rating_updates(
+            np.repeat(self.user_ids, np.diff(self.offsets)), self.movie_ids, self.ratings, records
+        )
+        return self.with_ratings(user_ids, movie_ids, ratings)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def user_position(self, user_id):
+        position = int(np.searchsorted(self.user_ids, user_id))
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+        return None
+
+    def user_slice(self, user_id):
+        """Return (movie_ids, ratings) array slices for a user, or None if unknown."""
+        position = self.user_position(user_id)
+        if position is None:
+            return None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.movie_ids[start:end], self.ratings[start:end]
+
+    def create_movies(self):
+        """Build Movie objects, with rating aggregates, from the catalogue arrays."""
+        movies = {}
+        for movie_id, title, genres in zip(
+            self.catalogue_ids.tolist(), self.titles.tolist(), self.genres.tolist()
+        ):
+            movies[movie_id] = Movie(movie_id=movie_id, title=title, genres=genres)
+
+        for movie_id, rating_sum, count in zip(
+            self.stat_movie_ids.tolist(), self.rating_sums.tolist(), self.rating_counts.tolist()
+        ):
+            movie = movies.get(movie_id)
+            if movie is not None:
+                movie.set_rating_stats(count, rating_sum)
+        return movies
+
+    def save(self, cache_dir, signature):
+        """Write the arrays to a new directory and atomically point snapshot.json at it.
+
+        Files that running processes have memory-mapped are never rewritten:
+        each save goes to a fresh ``snapshot-*`` directory, and older ones are
+        only unlinked, which leaves existing mappings intact.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        build_dir = tempfile.mkdtemp(prefix='.building-', dir=cache_dir)
+        try:
+            for name in SNAPSHOT_ARRAYS:
+                np.save(os.path.join(build_dir, f'{name}.npy'), getattr(self, name))
+            snapshot_dir = os.path.join(cache_dir, f'snapshot-{time.time_ns()}-{os.getpid()}')
+            os.rename(build_dir, snapshot_dir)
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+
+        meta_path = os.path.join(cache_dir, 'snapshot.json')
+        with tempfile.NamedTemporaryFile('w', dir=cache_dir, suffix='.json.tmp', delete=False) as f:
+            json.dump({'signature': signature, 'directory': os.path.basename(snapshot_dir)}, f)
+        os.replace(f.name, meta_path)
+        _remove_old_snapshots(cache_dir, keep=os.path.basename(snapshot_dir))
+
+    @classmethod
+    def load(cls, cache_dir, signature):
+        """Memory-map a saved snapshot; return None if missing or built from other sources."""
+        # A concurrent save may remove the directory between reading
+        # snapshot.json and opening the arrays; the second read sees its result.
+        for _ in range(2):
+            try:
+                with open(os.path.join(cache_dir, 'snapshot.json')) as f:
+                    meta = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+
+            if not isinstance(meta, dict) or meta.get('signature') != signature:
+                return None
+
+            snapshot_dir = os.path.join(cache_dir, meta['directory'])
+            try:
+                arrays = {
+                    name: np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode='r')
+                    for name in SNAPSHOT_ARRAYS
+                }
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                return None
+            return cls(**arrays)
+        return None
+
+
+def _remove_old_snapshots(cache_dir, keep):
+    """Delete superseded snapshot directories (and pre-directory cache files).
+
+    Unlinking a file that another process has mapped is safe: the mapping
+    keeps the old inode alive until it is closed.
+    """
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if entry.startswith('snapshot-') and entry != keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif entry.endswith('.npy'):
+            os.remove(path)
+
+
+def _file_signature(path):
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _source_signature(movies_path, ratings_path, tags_path, links_path):
+    return {
+        'version': SNAPSHOT_VERSION,
+        'movies': _file_signature(movies_path),
+        'ratings': _file_signature(ratings_path),
+        'tags': _file_signature(tags_path),
+        'links': _file_signature(links_path),
+    }
+
+
+def _companion_path(movies_path, file_name):
+    """Path of an optional dataset file next to movies.csv, or None if absent."""
+    path = os.path.join(os.path.dirname(os.path.abspath(movies_path)), file_name)
+    return path if os.path.exists(path) else None
+
+
+def default_cache_dir(ratings_path):
+    return os.path.join(os.path.dirname(os.path.abspath(ratings_path)), '.cache')
+
+
+def load_or_build_snapshot(movies_path, ratings_path, load_movies, cache_dir=None,
+                           tags_path=None, links_path=None):
+    """Load the on-disk snapshot, rebuilding it from the CSV files if stale.
+
+    ``load_movies`` is only called (and pandas only imported) on a rebuild.
+    Tags and links default to ``tags.csv``/``links.csv`` beside the movies
+    file and are simply left empty when those files are missing.
+    """
+    for path in (movies_path, ratings_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+    tags_path = tags_path or _companion_path(movies_path, 'tags.csv')
+    links_path = links_path or _companion_path(movies_path, 'links.csv')
+
+    cache_dir = cache_dir or default_cache_dir(ratings_path)
+    signature = _source_signature(movies_path, ratings_path, tags_path, links_path)
+    snapshot = DatasetSnapshot.load(cache_dir, signature)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = DatasetSnapshot.from_csv(load_movies(movies_path), ratings_path, tags_path, links_path)
+    try:
+        snapshot.save(cache_dir, signature)
+    except OSError:
+        # A read-only dataset directory only costs us the cache, not the data.
+        return snapshot
+    return DatasetSnapshot.load(cache_dir, signature) or snapshot
+
+
+class _Profile(dict):
+    """Rating dict handed out by LazyUserRatings.
+
+    Writing to it pins the profile so an edited profile is never evicted from
+    the LRU cache and silently replaced by the snapshot version.
+    """
+
+    def __init__(self, owner, user_id, *args):
+        super().__init__(*args)
+        self._owner = owner
+        self._user_id = user_id
+
+    def __setitem__(self, movie_id, rating):
+        super().__setitem__(movie_id, rating)
+        self._owner.pin(self._user_id, self)
+
+    def __delitem__(self, movie_id):
+        super().__delitem__(movie_id)
+        self._owner.pin(self._user_id, self)
+
+
+class LazyUserRatings(MutableMapping):
+    """user_id -> {movie_id: rating} mapping resolved from a snapshot on access.
+
+    At most ``max_cached`` unmodified profiles are kept materialized; profiles
+    that have been written to stay pinned in memory for the whole session.
+    """
+
+    def __init__(self, snapshot, max_cached=256):
+        self.snapshot = snapshot
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._pinned = {}
+
+    def __getitem__(self, user_id):
+        if user_id in self._pinned:
+            return self._pinned[user_id]
+
+        profile = self._cache.get(user_id)
+        if profile is not None:
+            self._cache.move_to_end(user_id)
+            return profile
+
+        user_slice = self.snapshot.user_slice(user_id)
+        if user_slice is None:
+            raise KeyError(user_id)
+
+        movie_ids, ratings = user_slice
+        profile = _Profile(self, user_id, zip(movie_ids.tolist(), ratings.tolist()))
+        self._cache[user_id] = profile
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return profile
+
+    def __setitem__(self, user_id, ratings):
+        self.pin(user_id, _Profile(self, user_id, ratings))
+
+    def __delitem__(self, user_id):
+        raise TypeError("Users stored in the ratings snapshot cannot be removed")
+
+    def __contains__(self, user_id):
+        return user_id in self._pinned or self.snapshot.user_position(user_id) is not None
+
+    def __iter__(self):
+        for user_id in self.snapshot.user_ids.tolist():
+            yield user_id
+        for user_id in self._pinned:
+            if self.snapshot.user_position(user_id) is None:
+                yield user_id
+
+    def __len__(self):
+        extra = sum(1 for user_id in self._pinned if self.snapshot.user_position(user_id) is None)
+        return len(self.snapshot) + extra
+
+    def pin(self, user_id, profile):
+        self._cache.pop(user_id, None)
+        self._pinned[user_id] = profile
+
+    def to_arrays(self):
+        """Return (user_ids, movie_ids, ratings) for every rating without materializing profiles."""
+        snapshot = self.snapshot
+        user_ids = np.repeat(snapshot.user_ids, np.diff(snapshot.offsets))
+        movie_ids = np.asarray(snapshot.movie_ids)
+        ratings = np.asarray(snapshot.ratings)
+        if not self._pinned:
+            return user_ids, movie_ids, ratings
+
+        keep = ~np.isin(user_ids, list(self._pinned))
+        pinned_users = [user_id for user_id, profile in self._pinned.items() for _ in profile]
+        pinned_movies = [movie_id for profile in self._pinned.values() for movie_id in profile]
+        pinned_ratings = [rating for profile in self._pinned.values() for rating in profile.values()]
+        return (
+            np.concatenate([user_ids[keep], np.array(pinned_users, dtype=np.int64)]),
+            np.concatenate([movie_ids[keep], np.array(pinned_movies, dtype=np.int64)]),
+            np.concatenate([ratings[keep], np.array(pinned_ratings, dtype=np.float64)]),
+        )
+
+
+class LazyUserMovies(MutableMapping):
+    """user_id -> set of rated movie ids, derived from a LazyUserRatings."""
+
+    def __init__(self, user_ratings):
+        self.user_ratings = user_ratings
+        self._assigned = {}
+
+    def __getitem__(self, user_id):
+        movie_ids = self._assigned.get(user_id)
+        if movie_ids is not None:
+            movie_ids.update(self.user_ratings[user_id].keys())
+            return movie_ids
+        return set(self.user_ratings[user_id].keys())
+
+    def __setitem__(self, user_id, movie_ids):
+        self._assigned[user_id] = movie_ids
+
+    def __delitem__(self, user_id):
+        raise TypeError("Users stored in the ratings snapshot cannot be removed")
+
+    def __contains__(self, user_id):
+        return user_id in self.user_ratings
+
+    def __iter__(self):
+        return iter(self.user_ratings)
+
+    def __len__(self):
+        return len(self.user_ratings)
+
@@ -0,0 +1,186 @@
+import numpy as np
+
+
+MISSING_ID = -1
+
+
+def normalize_tag(tag):
+    """Lower-case a tag and collapse runs of whitespace."""
+    return ' '.join(str(tag).lower().split())
+
+
+def _catalogue_positions(catalogue_ids, movie_ids):
+    """Position of each movie id in the catalogue, or -1 when it is not there."""
+    if len(catalogue_ids) == 0:
+        return np.full(len(movie_ids), -1, dtype=np.int64)
+    sorter = np.argsort(catalogue_ids, kind='stable')
+    found = np.searchsorted(catalogue_ids, movie_ids, sorter=sorter)
+    positions = sorter[np.minimum(found, len(catalogue_ids) - 1)]
+    return np.where(catalogue_ids[positions] == movie_ids, positions, -1)
+
+
+def build_tag_arrays(catalogue_ids, tags_path=None):
+    """Read tags.csv into a per-movie sparse tag-count matrix (CSR, catalogue order)."""
+    arrays = {
+        'tag_names': np.array([], dtype=np.str_),
+        'movie_tag_offsets': np.zeros(len(catalogue_ids) + 1, dtype=np.int64),
+        'movie_tag_ids': np.array([], dtype=np.int32),
+        'movie_tag_counts': np.array([], dtype=np.int32),
+    }
+    if tags_path is None:
+        return arrays
+
+    import pandas as pd
+
+    try:
+        tags_df = pd.read_csv(tags_path, usecols=['movieId', 'tag'])
+    except pd.errors.EmptyDataError:
+        return arrays
+    except ValueError as e:
+        raise ValueError(f"Error parsing tags CSV file: {e}")
+
+    tags_df = tags_df.dropna()
+    tags_df['tag'] = tags_df['tag'].map(normalize_tag)
+    tags_df = tags_df[tags_df['tag'] != '']
+    positions = _catalogue_positions(catalogue_ids, tags_df['movieId'].to_numpy(dtype=np.int64))
+    tags_df = tags_df.assign(position=positions)
+    tags_df = tags_df[tags_df['position'] >= 0]
+    if tags_df.empty:
+        return arrays
+
+    tag_names, tag_ids = np.unique(tags_df['tag'].to_numpy(dtype=np.str_), return_inverse=True)
+    pair_counts = (
+        pd.DataFrame({'position': tags_df['position'].to_numpy(), 'tag_id': tag_ids})
+        .groupby(['position', 'tag_id']).size()
+    )
+    pair_positions = pair_counts.index.get_level_values('position').to_numpy()
+    offsets = np.zeros(len(catalogue_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_positions, minlength=len(catalogue_ids)), out=offsets[1:])
+
+    arrays['tag_names'] = tag_names
+    arrays['movie_tag_offsets'] = offsets
+    arrays['movie_tag_ids'] = pair_counts.index.get_level_values('tag_id').to_numpy(dtype=np.int32)
+    arrays['movie_tag_counts'] = pair_counts.to_numpy(dtype=np.int32)
+    return arrays
+
+
+def build_link_arrays(catalogue_ids, links_path=None):
+    """Read links.csv into IMDb and TMDb id arrays aligned with the catalogue."""
+    imdb_ids = np.full(len(catalogue_ids), MISSING_ID, dtype=np.int64)
+    tmdb_ids = np.full(len(catalogue_ids), MISSING_ID, dtype=np.int64)
+    if links_path is not None:
+        import pandas as pd
+
+        try:
+            links_df = pd.read_csv(links_path)
+        except pd.errors.EmptyDataError:
+            links_df = None
+        except ValueError as e:
+            raise ValueError(f"Error parsing links CSV file: {e}")
+
+        if links_df is not None:
+            links_df = links_df.dropna(subset=['movieId'])
+            positions = _catalogue_positions(catalogue_ids, links_df['movieId'].to_numpy(dtype=np.int64))
+            known = positions >= 0
+            for column, target in (('imdbId', imdb_ids), ('tmdbId', tmdb_ids)):
+                values = pd.to_numeric(links_df[column], errors='coerce').fillna(MISSING_ID).to_numpy(dtype=np.int64)
+                target[positions[known]] = values[known]
+
+    return {'imdb_ids': imdb_ids, 'tmdb_ids': tmdb_ids}
+
+
+class TagIndex:
+    """Tag and external-id lookups over the compact arrays stored in a snapshot.
+
+    Per-movie tag vectors are a CSR matrix in catalogue order
+    (``movie_tag_offsets``/``movie_tag_ids``/``movie_tag_counts``); the
+    tag -> movies inverted index is the same matrix sorted by tag, with each
+    tag's movies ordered by how often the tag was applied.
+    """
+
+    def __init__(self, catalogue_ids, tag_names, movie_tag_offsets, movie_tag_ids, movie_tag_counts,
+                 imdb_ids, tmdb_ids):
+        self.catalogue_ids = np.asarray(catalogue_ids)
+        self.tag_names = np.asarray(tag_names)
+        self.movie_tag_offsets = np.asarray(movie_tag_offsets)
+        self.movie_tag_ids = np.asarray(movie_tag_ids)
+        self.movie_tag_counts = np.asarray(movie_tag_counts)
+        self.imdb_ids = np.asarray(imdb_ids)
+        self.tmdb_ids = np.asarray(tmdb_ids)
+
+        self.tag_lookup = {name: i for i, name in enumerate(self.tag_names.tolist())}
+        self.movie_positions = {movie_id: i for i, movie_id in enumerate(self.catalogue_ids.tolist())}
+        self.entry_positions = np.repeat(np.arange(len(self.catalogue_ids)), np.diff(self.movie_tag_offsets))
+
+        order = np.lexsort((-self.movie_tag_counts, self.movie_tag_ids))
+        self.tag_movie_positions = self.entry_positions[order]
+        self.tag_movie_counts = self.movie_tag_counts[order]
+        self.tag_offsets = np.zeros(len(self.tag_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.movie_tag_ids, minlength=len(self.tag_names)), out=self.tag_offsets[1:])
+
+        # Inverse document frequency of each tag over tagged movies
+        tagged_movies = max(int(np.count_nonzero(np.diff(self.movie_tag_offsets))), 1)
+        document_frequency = np.diff(self.tag_offsets)
+        self.idf = np.log((1 + tagged_movies) / (1 + document_frequency)) + 1.0
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(
+            snapshot.catalogue_ids, snapshot.tag_names, snapshot.movie_tag_offsets,
+            snapshot.movie_tag_ids, snapshot.movie_tag_counts, snapshot.imdb_ids, snapshot.tmdb_ids
+        )
+
+    def __len__(self):
+        return len(self.tag_names)
+
+    def matching_tags(self, term):
+        """Tags equal to the normalized term, or else containing it."""
+        term = normalize_tag(term)
+        if not term:
+            return []
+        if term in self.tag_lookup:
+            return [term]
+        return [name for name in self.tag_names.tolist() if term in name]
+
+    def search(self, term):
+        """Return (matched tags, [(movie_id, tag count)]) ranked by count."""
+        tags = self.matching_tags(term)
+        counts = np.zeros(len(self.catalogue_ids), dtype=np.int64)
+        for tag in tags:
+            tag_id = self.tag_lookup[tag]
+            start, end = self.tag_offsets[tag_id], self.tag_offsets[tag_id + 1]
+            np.add.at(counts, self.tag_movie_positions[start:end], self.tag_movie_counts[start:end])
+
+        positions = np.flatnonzero(counts)
+        positions = positions[np.argsort(-counts[positions], kind='stable')]
+        return tags, list(zip(self.catalogue_ids[positions].tolist(), counts[positions].tolist()))
+
+    def movie_tags(self, movie_id):
+        """Return [(tag, count)] for a movie, most applied first."""
+        position = self.movie_positions.get(movie_id)
+        if position is None:
+            return []
+        start, end = self.movie_tag_offsets[position], self.movie_tag_offsets[position + 1]
+        pairs = zip(self.tag_names[self.movie_tag_ids[start:end]].tolist(), self.movie_tag_counts[start:end].tolist())
+        return sorted(pairs, key=lambda x: x[1], reverse=True)
+
+    def external_ids(self, movie_id):
+        """Return (imdb_id, tmdb_id) for a movie; missing ids are None."""
+        position = self.movie_positions.get(movie_id)
+        if position is None:
+            return None, None
+        imdb_id, tmdb_id = int(self.imdb_ids[position]), int(self.tmdb_ids[position])
+        return (None if imdb_id == MISSING_ID else imdb_id), (None if tmdb_id == MISSING_ID else tmdb_id)
+
+    def _movie_for(self, ids, external_id):
+        # Valid IMDb/TMDb ids are positive; MISSING_ID marks movies without one
+        if external_id <= 0:
+            return None
+        positions = _catalogue_positions(ids, np.array([external_id], dtype=np.int64))
+        return int(self.catalogue_ids[positions[0]]) if positions[0] >= 0 else None
+
+    def movie_for_imdb(self, imdb_id):
+        return self._movie_for(self.imdb_ids, int(imdb_id))
+
+    def movie_for_tmdb(self, tmdb_id):
+        return self._movie_for(self.tmdb_ids, int(tmdb_id))
@@ -0,0 +1,79 @@
+import numpy as np
+
+from recommender import Recommender
+
+
+class TagRecommender(Recommender):
+    """Recommends movies whose tags overlap with the tags of movies a user liked.
+
+    Every movie is a sparse TF-IDF vector over tags, normalized to unit
+    length. A user's profile is the sum of the vectors of the movies they
+    rated at or above ``min_rating``, and candidates are scored by their dot
+    product with it in a single pass over the tag entries.
+    """
+
+    def __init__(self, movies, user_ratings, tag_index, min_rating=3.5):
+        super().__init__(movies, user_ratings)
+        self.tag_index = tag_index
+        self.min_rating = min_rating
+
+        catalogue_ids = tag_index.catalogue_ids.tolist()
+        self.average_ratings = np.array(
+            [movies[movie_id].average_rating if movie_id in movies else 0.0 for movie_id in catalogue_ids],
+            dtype=np.float64
+        )
+
+        entry_weights = tag_index.movie_tag_counts * tag_index.idf[tag_index.movie_tag_ids]
+        norms = np.sqrt(np.bincount(
+            tag_index.entry_positions, weights=entry_weights ** 2, minlength=len(catalogue_ids)
+        ))
+        self.entry_weights = entry_weights / norms[tag_index.entry_positions]
+
+    def _positions(self, movie_ids):
+        positions = (self.tag_index.movie_positions.get(movie_id) for movie_id in movie_ids)
+        return np.array([position for position in positions if position is not None], dtype=np.int64)
+
+    def tag_profile(self, user_id):
+        """Tag weights summed over the movies the user liked, indexed by tag id."""
+        index = self.tag_index
+        liked = [movie_id for movie_id, rating in self.user_ratings.get(user_id, {}).items()
+                 if rating >= self.min_rating]
+        profile = np.zeros(len(index))
+        for position in self._positions(liked).tolist():
+            start, end = index.movie_tag_offsets[position], index.movie_tag_offsets[position + 1]
+            profile[index.movie_tag_ids[start:end]] += self.entry_weights[start:end]
+        return profile
+
+    def score_movies(self, user_id):
+        """Tag-overlap score of every catalogue movie, in tag_index.catalogue_ids order."""
+        index = self.tag_index
+        profile = self.tag_profile(user_id)
+        return np.bincount(
+            index.entry_positions, weights=self.entry_weights * profile[index.movie_tag_ids],
+            minlength=len(index.catalogue_ids)
+        )
+
+    def recommend(self, user_id, n=10):
+        return [movie for movie, _ in self.recommend_with_scores(user_id, n)]
+
+    def recommend_with_scores(self, user_id, n=10):
+        if user_id not in self.user_ratings or n <= 0:
+            return []
+
+        scores = self.score_movies(user_id)
+        scores[self._positions(self.user_ratings[user_id].keys())] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > n:
+            # Keep everything tied with the n-th best score for the tie-breaker
+            threshold = np.partition(scores[candidates], -n)[-n]
+            candidates = candidates[scores[candidates] >= threshold]
+
+        top = candidates[np.lexsort((-self.average_ratings[candidates], -scores[candidates]))[:n]]
+        movie_ids = self.tag_index.catalogue_ids[top].tolist()
+        return [(self.movies[movie_id], score) for movie_id, score in zip(movie_ids, scores[top].tolist())
+                if movie_id in self.movies]
+
+    def record_rating(self, user_id, movie_id, rating, old_rating=None):
+        position = self.tag_index.movie_positions.get(movie_id)
+        if position is not None and movie_id in self.movies:
+            self.average_ratings[position] = self.movies[movie_id].average_rating
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class UserProfiles:
+    """Array-backed view of user rating profiles.
+
+    Each user's ratings are materialized on first use as a pair of arrays
+    (catalogue column indices, ratings) so neighbour rows can be gathered and
+    aggregated with numpy instead of walking rating dicts. At most
+    ``max_cached`` rows are kept, least recently used first out.
+    """
+
+    def __init__(self, movies, user_ratings, max_cached=256):
+        self.movies = movies
+        self.user_ratings = user_ratings
+        self.movie_ids = np.array(sorted(movies.keys()), dtype=np.int64)
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(self.movie_ids.tolist())}
+        self.average_ratings = np.array(
+            [movies[movie_id].average_rating for movie_id in self.movie_ids.tolist()],
+            dtype=np.float64
+        )
+        self.max_cached = max_cached
+        self._rows = OrderedDict()
+
+    @property
+    def n_movies(self):
+        return len(self.movie_ids)
+
+    def row(self, user_id):
+        """Return (columns, ratings) arrays for a user, building them on first access."""
+        cached = self._rows.get(user_id)
+        if cached is not None:
+            self._rows.move_to_end(user_id)
+            return cached
+
+        ratings = self.user_ratings.get(user_id, {})
+        columns = []
+        values = []
+        for movie_id, rating in ratings.items():
+            column = self.movie_index.get(movie_id)
+            if column is not None:
+                columns.append(column)
+                values.append(rating)
+
+        row = (np.array(columns, dtype=np.int64), np.array(values, dtype=np.float64))
+        self._rows[user_id] = row
+        if len(self._rows) > self.max_cached:
+            self._rows.popitem(last=False)
+        return row
+
+    def gather(self, user_ids, weights=None):
+        """Concatenate the rows of several users.
+
+        Returns (columns, ratings, row_weights) where row_weights repeats each
+        user's weight once per rating, or is None when no weights are given.
+        """
+        rows = [self.row(user_id) for user_id in user_ids]
+        if not rows:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, np.empty(0, dtype=np.float64), None
+
+        columns = np.concatenate([cols for cols, _ in rows])
+        ratings = np.concatenate([vals for _, vals in rows])
+
+        row_weights = None
+        if weights is not None:
+            lengths = [len(cols) for cols, _ in rows]
+            row_weights = np.repeat(np.asarray(weights, dtype=np.float64), lengths)
+
+        return columns, ratings, row_weights
+
+    def rated_mask(self, user_id):
+        mask = np.zeros(self.n_movies, dtype=bool)
+        columns, _ = self.row(user_id)
+        mask[columns] = True
+        return mask
+
+    def record_rating(self, user_id, movie_id):
+        """Drop the cached row for a user and refresh the movie's average."""
+        self._rows.pop(user_id, None)
+        column = self.movie_index.get(movie_id)
+        if column is not None:
+            self.average_ratings[column] = self.movies[movie_id].average_rating
@@ -1,31 +1,59 @@
+import numpy as np
+
+from genre_preferences import rating_arrays
 from recommender import Recommender
+from user_profiles import UserProfiles
 
 
 class UserSimilarityRecommender(Recommender):
-    def __init__(self, movies, user_ratings, user_movie_mapping):
+    """Recommends movies liked by the users whose rated sets overlap most.
+
+    Neighbours are found through a movie -> users index over every rating
+    (a single ``shard_search.ShardPartition``), built from the rating arrays
+    on first use, so a search never materializes other users' profiles.
+
+    With ``shards=N`` direct neighbour search and the neighbours' liked
+    movies are served by N worker processes that each hold a hash partition
+    of the ratings (see shard_search); call ``close`` to stop them. A
+    recommendation then reads only the query user's own profile locally.
+    Recursive search (``recursive_depth > 1``) still uses the local index.
+    """
+
+    def __init__(self, movies, user_ratings, user_movie_mapping, shards=None):
         super().__init__(movies, user_ratings)
         self.user_movie_mapping = user_movie_mapping
+        self.profiles = UserProfiles(movies, user_ratings)
+        self.neighbor_index = None
+        self._local_index = None
+        if shards:
+            from shard_search import ShardedNeighborIndex
+
+            self.neighbor_index = ShardedNeighborIndex.from_ratings(user_ratings, shards)
     
     def calculate_jaccard_similarity(self, set1, set2):
         intersection = len(set1 & set2)
         union = len(set1 | set2)
         return intersection / union if union > 0 else 0.0
     
+    @property
+    def local_index(self):
+        """In-process movie -> users index over every rating, built on first use."""
+        if self._local_index is None:
+            from shard_search import ShardPartition
+
+            self._local_index = ShardPartition(*rating_arrays(self.user_ratings))
+        return self._local_index
+
     def find_similar_users(self, user_id, n=20):
         if user_id not in self.user_movie_mapping:
             return []
-        
-        user_movies = self.user_movie_mapping[user_id]
-        similarities = []
-        
-        for other_user_id, other_user_movies in self.user_movie_mapping.items():
-            if other_user_id != user_id:
-                similarity = self.calculate_jaccard_similarity(user_movies, other_user_movies)
-                if similarity > 0:
-                    similarities.append((other_user_id, similarity))
-        
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:n]
+
+        if self.neighbor_index is not None:
+            user_movies = self.user_movie_mapping[user_id]
+            return self.neighbor_index.find_similar_users(user_movies, n, exclude_user_id=user_id)
+
+        index = self.local_index
+        return index.top_k(index.user_movies(user_id), n, exclude_user_id=user_id)
 
     def find_similar_users_recursive(self, user_id, depth=2, max_neighbors=20, decay_rate=0.6):
         if depth <= 1:
@@ -34,42 +62,74 @@ class UserSimilarityRecommender(Recommender):
         if user_id not in self.user_movie_mapping:
             return []
 
-        visited = set([user_id])
-        weights = {}
+        index = self.local_index
+        start_row = index.user_rows.get(user_id)
+        if start_row is None:
+            return []
+
+        # Rows of the index: users on the current search path, and the best
+        # decayed similarity reached for each user so far
+        visited = np.zeros(len(index.user_ids), dtype=bool)
+        weights = np.zeros(len(index.user_ids))
+        visited[start_row] = True
 
         def dfs(current_user, remaining_depth, current_decay):
-            current_movies = self.user_movie_mapping.get(current_user, set())
-            for other_user, other_movies in self.user_movie_mapping.items():
-                if other_user in visited:
-                    continue
-                sim = self.calculate_jaccard_similarity(current_movies, other_movies)
-                if sim <= 0:
-                    continue
-                weight = sim * current_decay
-                if weight > weights.get(other_user, 0):
-                    weights[other_user] = weight
-                if remaining_depth > 1:
-                    visited.add(other_user)
-                    dfs(other_user, remaining_depth - 1, current_decay * decay_rate)
-                    visited.remove(other_user)
+            similarities = index.similarities(index.user_movies(current_user))
+            similarities[visited] = 0.0
+            neighbours = np.flatnonzero(similarities > 0)
+            weights[neighbours] = np.maximum(weights[neighbours], similarities[neighbours] * current_decay)
+            if remaining_depth > 1:
+                for row in neighbours.tolist():
+                    visited[row] = True
+                    dfs(int(index.user_ids[row]), remaining_depth - 1, current_decay * decay_rate)
+                    visited[row] = False
 
         dfs(user_id, depth, 1.0)
 
-        results = sorted(weights.items(), key=lambda x: x[1], reverse=True)
-        return results[:max_neighbors]
-    
-    def get_movies_liked_by_users(self, user_ids, min_rating=3.5):
-        movie_likes = {}
-        
-        for user_id in user_ids:
-            if user_id in self.user_ratings:
-                for movie_id, rating in self.user_ratings[user_id].items():
-                    if rating >= min_rating:
-                        movie_likes[movie_id] = movie_likes.get(movie_id, 0) + 1
-        
-        return movie_likes
-    
-    def recommend(self, user_id, n=10, recursive_depth=1, decay_rate=0.6):
+        rows = np.flatnonzero(weights > 0)
+        order = np.lexsort((index.user_ids[rows], -weights[rows]))[:max_neighbors]
+        return list(zip(index.user_ids[rows[order]].tolist(), weights[rows[order]].tolist()))
+
+    def _accumulate_likes(self, user_ids, min_rating=3.5, weights=None):
+        index = self.neighbor_index if self.neighbor_index is not None else self.local_index
+        movie_ids, entry_weights = index.liked_movies(user_ids, weights, min_rating)
+        catalogue = self.profiles.movie_ids
+        columns = np.minimum(np.searchsorted(catalogue, movie_ids), max(len(catalogue) - 1, 0))
+        known = catalogue[columns] == movie_ids
+        if entry_weights is not None:
+            entry_weights = entry_weights[known]
+        return np.bincount(columns[known], weights=entry_weights, minlength=self.profiles.n_movies)
+
+    def get_movies_liked_by_users(self, user_ids, min_rating=3.5, weights=None):
+        likes = self._accumulate_likes(user_ids, min_rating, weights)
+        columns = np.flatnonzero(likes)
+        movie_ids = self.profiles.movie_ids[columns].tolist()
+        return dict(zip(movie_ids, likes[columns].tolist()))
+
+    def _top_candidates(self, likes, exclude_mask, n):
+        candidates = np.flatnonzero((likes > 0) & ~exclude_mask)
+        if len(candidates) == 0 or n <= 0:
+            return candidates[:0]
+
+        candidate_likes = likes[candidates]
+        if len(candidates) > n:
+            # Keep everything tied with the n-th best like count so the
+            # average-rating tie-breaker still sees every contender.
+            threshold = np.partition(candidate_likes, -n)[-n]
+            keep = candidate_likes >= threshold
+            candidates = candidates[keep]
+            candidate_likes = candidate_likes[keep]
+
+        averages = self.profiles.average_ratings[candidates]
+        order = np.lexsort((candidates, -averages, -candidate_likes))
+        return candidates[order[:n]]
+
+    def recommend(self, user_id, n=10, recursive_depth=1, decay_rate=0.6, weighted=False):
+        scored = self.recommend_with_scores(user_id, n, recursive_depth, decay_rate, weighted)
+        return [movie for movie, _ in scored]
+
+    def recommend_with_scores(self, user_id, n=10, recursive_depth=1, decay_rate=0.6, weighted=False):
+        """Return [(Movie, score)] where the score is the (weighted) like count."""
         if recursive_depth > 1:
             similar_users = self.find_similar_users_recursive(user_id, depth=recursive_depth, decay_rate=decay_rate)
         else:
@@ -79,19 +139,21 @@ class UserSimilarityRecommender(Recommender):
             return []
 
         similar_user_ids = [u_id for u_id, _ in similar_users]
-        movie_likes = self.get_movies_liked_by_users(similar_user_ids)
-        
-        if not movie_likes:
-            return []
-        
-        user_rated_movies = self.get_user_rated_movies(user_id)
-        candidate_movie_ids = set(movie_likes.keys()) - user_rated_movies
-        
-        candidates = []
-        for movie_id in candidate_movie_ids:
-            if movie_id in self.movies:
-                candidates.append((self.movies[movie_id], movie_likes[movie_id]))
-        
-        candidates.sort(key=lambda x: (x[1], x[0].average_rating), reverse=True)
-        
-        return [movie for movie, _ in candidates[:n]]
\ No newline at end of file
+        weights = [similarity for _, similarity in similar_users] if weighted else None
+        likes = self._accumulate_likes(similar_user_ids, weights=weights)
+
+        top_columns = self._top_candidates(likes, self.profiles.rated_mask(user_id), n)
+        movie_ids = self.profiles.movie_ids[top_columns].tolist()
+        return [(self.movies[movie_id], score) for movie_id, score in zip(movie_ids, likes[top_columns].tolist())]
+
+    def record_rating(self, user_id, movie_id, rating, old_rating=None):
+        self.profiles.record_rating(user_id, movie_id)
+        if self._local_index is not None:
+            self._local_index.add(user_id, movie_id, rating)
+        if self.neighbor_index is not None:
+            self.neighbor_index.add_rating(user_id, movie_id, rating)
+
+    def close(self):
+        if self.neighbor_index is not None:
+            self.neighbor_index.close()
+            self.neighbor_index = None